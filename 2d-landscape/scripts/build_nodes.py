@@ -0,0 +1,73 @@
+"""
+Build the final nodes.json in one pass: UMAP coordinates -> canvas positions
+with random offsets -> only the fields needed for rendering.
+
+Replaces running precompute_positions.py and optimize_nodes.py one after the
+other (the x/y that add_positions_to_nodes.py and scale_positions.py write are
+overwritten by precompute_positions.py), so nodes.json is parsed and written
+once. Positions are computed on NumPy arrays for all nodes at a time.
+"""
+import json
+import os
+import numpy as np
+
+# SVG canvas dimensions (from landscape HTML, as in precompute_positions.py)
+BASE_WIDTH = 1920
+BASE_HEIGHT = 1080
+WIDTH_SCALE = 1.67
+HEIGHT_SCALE = 4.5
+SVG_WIDTH = BASE_WIDTH * WIDTH_SCALE
+SVG_HEIGHT = BASE_HEIGHT * HEIGHT_SCALE
+MARGIN_X = int(80 * WIDTH_SCALE)
+MARGIN_Y = int(60 * HEIGHT_SCALE)
+
+# Random offsets in [-OFFSET_RANGE / 2, OFFSET_RANGE / 2) on both axes (same as landscape),
+# seeded so an unchanged input gives the same nodes.json
+OFFSET_RANGE = 2500
+OFFSET_SEED = 42
+
+
+def scale_axis(values, margin, size):
+    """Map values onto [margin, size - margin] (same logic as D3.js scaleLinear), the middle when all equal"""
+    low, high = values.min(), values.max()
+    if high == low:
+        return np.full(len(values), size / 2)
+    return margin + (values - low) / (high - low) * (size - 2 * margin)
+
+
+# Load nodes with UMAP coordinates
+with open('data/nodes.json', 'r', encoding='utf-8') as f:
+    nodes = json.load(f)
+original_size = os.path.getsize('data/nodes.json') / 1024 / 1024  # MB
+
+# Coordinate arrays, one entry per node
+umap_x = np.array([node.get('umap_x', 0.5) for node in nodes], dtype=float)
+umap_y = np.array([node.get('umap_y', 0.5) for node in nodes], dtype=float)
+
+rng = np.random.default_rng(OFFSET_SEED)
+x = scale_axis(umap_x, MARGIN_X, SVG_WIDTH) + (rng.random(len(nodes)) - 0.5) * OFFSET_RANGE
+y = scale_axis(umap_y, MARGIN_Y, SVG_HEIGHT) + (rng.random(len(nodes)) - 0.5) * OFFSET_RANGE
+
+# Keep only essential fields for rendering, positions from the arrays
+optimized_nodes = [
+    {
+        'url': node['url'],
+        'sentence': node.get('sentence'),
+        'highlighted_sentence': node.get('highlighted_sentence', []),
+        'x': node_x,
+        'y': node_y,
+        'color': node['color']
+    }
+    for node, node_x, node_y in zip(nodes, x.tolist(), y.tolist())
+]
+
+# Save, the only write of the pass
+with open('data/nodes.json', 'w', encoding='utf-8') as f:
+    json.dump(optimized_nodes, f, indent=2)
+
+new_size = os.path.getsize('data/nodes.json') / 1024 / 1024  # MB
+
+print(f'✅ Built nodes.json for {len(nodes)} nodes')
+print(f'  UMAP bounds: X [{umap_x.min():.3f}, {umap_x.max():.3f}], Y [{umap_y.min():.3f}, {umap_y.max():.3f}]')
+print(f'  SVG mapping: {int(SVG_WIDTH)}x{int(SVG_HEIGHT)} with X margin {MARGIN_X}, Y margin {MARGIN_Y}')
+print(f'  Size: {original_size:.2f} MB -> {new_size:.2f} MB')
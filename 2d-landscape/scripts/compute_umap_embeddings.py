@@ -2,66 +2,71 @@
 Compute UMAP embeddings for design landscape nodes based on keywords
 """
 import json
+import sys
 import numpy as np
 import umap
-from sklearn.preprocessing import StandardScaler
+from sklearn.feature_extraction.text import TfidfTransformer
+from sklearn.preprocessing import MaxAbsScaler
 from pathlib import Path
 
+# Shared keyword vocabulary and kNN graph cache live with the 3D pipeline scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / '3d-landscape' / 'scripts'))
+from keyword_counts import KeywordCounts
+from keyword_vocabulary import load_vocabulary
+from knn_graph import cached_knn, default_knn_cache_dir
+
+# How keyword counts are scaled before UMAP, both keep the matrix sparse:
+# 'tfidf' (down-weights keywords most nodes share, rows L2-normalized)
+# or 'maxabs' (each keyword's counts divided by its largest count)
+SCALING = 'tfidf'
+
+
+def found_keywords(node, variant_to_main):
+    """
+    Keywords of the node's design and critical analysis, one per word found
+    (with repeats): the word's main keyword when it is a vocabulary variant,
+    its category otherwise
+    """
+    keywords = []
+    for section in ('design_keywords_found', 'critical_keywords_found'):
+        for category, words in node.get(section, {}).items():
+            keywords.extend(variant_to_main.get(word.lower(), category) for word in words)
+    return keywords
+
+
 # Load nodes data
 with open('data/nodes.json', 'r', encoding='utf-8') as f:
     nodes = json.load(f)
 
-# All 35 keywords (17 design + 18 critical)
-ALL_KEYWORDS = {
-    # Design keywords
-    "design", "method", "making", "applied art", "intention", "plan", 
-    "research", "tool", "inquiry", "practice", "work", "concept", 
-    "craft", "exploration", "engineering", "shape", "project",
-    # Critical keywords
-    "critical", "conceptual", "analytical", "deconstructive", "collaborative",
-    "interdisciplinary", "contextual", "iterative", "reflective", "theoretical",
-    "evaluative", "investigative", "explorative", "dialectical", "discursive",
-    "reflexive", "narrative", "speculative", "systemic"
-}
-
-# Create keyword occurrence vectors
-weight_vectors = []
-
-for node in nodes:
-    # Count occurrences of each keyword in design and critical keywords found
-    vector = []
-    design_kw = node.get('design_keywords_found', {})
-    critical_kw = node.get('critical_keywords_found', {})
-    
-    for keyword in sorted(ALL_KEYWORDS):
-        # Count occurrences in design keywords
-        if keyword in design_kw:
-            count = len(design_kw[keyword])
-        elif keyword in critical_kw:
-            count = len(critical_kw[keyword])
-        else:
-            count = 0
-        vector.append(count)
-    
-    weight_vectors.append(vector)
+# The keywords found in each node, lemmatized with the shared vocabulary of
+# keywords_precomputed.json, counted into a sparse nodes x keywords matrix
+vocabulary = load_vocabulary('data/keywords_precomputed.json')
+counts = KeywordCounts.from_lists([found_keywords(node, vocabulary.variant_to_main) for node in nodes])
+X = counts.matrix.astype(np.float32)
 
-# Convert to numpy array and normalize using StandardScaler
-X = np.array(weight_vectors, dtype=float)
-scaler = StandardScaler()
-X_scaled = scaler.fit_transform(X)
+# Scale without centering, so the matrix stays sparse all the way into UMAP
+if SCALING == 'tfidf':
+    X_scaled = TfidfTransformer().fit_transform(X)
+else:
+    X_scaled = MaxAbsScaler().fit_transform(X)
 
-print(f"Computing UMAP embeddings for {len(nodes)} nodes with {X_scaled.shape[1]} features...")
+print(f"Computing UMAP embeddings for {len(nodes)} nodes with {X_scaled.shape[1]} features "
+      f"({X_scaled.nnz} non-zero, {SCALING})...")
 
 # Compute UMAP with parameters that work well for design landscapes
 # n_neighbors: how many local neighbors to consider (lower = more local structure)
 # min_dist: minimum distance between points (lower = more clumped)
 # metric: distance metric (correlation works well for normalized weights)
+# The neighbor graph is cached per (features, metric, k), so re-runs with a
+# different min_dist or n_components skip the neighbor search
+knn = cached_knn(X_scaled, 15, 'cosine', default_knn_cache_dir('data'), random_state=42)
 reducer = umap.UMAP(
     n_components=2,
     n_neighbors=15,
     min_dist=0.1,
     metric='cosine',
     random_state=42,
+    precomputed_knn=knn,
     verbose=1
 )
 
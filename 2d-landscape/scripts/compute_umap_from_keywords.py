@@ -1,8 +1,23 @@
 import json
+import sys
 import numpy as np
 from collections import defaultdict
+from pathlib import Path
+from scipy import sparse
 from umap import UMAP
 
+# Columnar record store lives with the 3D pipeline scripts
+sys.path.insert(0, str(Path(__file__).resolve().parents[2] / '3d-landscape' / 'scripts'))
+from columnar_records import write_records
+
+# Distance between nodes' keyword sets: 'jaccard' (shared / combined keywords)
+# or 'cosine'. UMAP computes either directly on the sparse matrix.
+METRIC = 'jaccard'
+
+# Intermediate for later steps (flip_umap_x.py), in the columnar store;
+# export JSON with: python 3d-landscape/scripts/columnar_records.py <store> <output.json>
+OUTPUT_PATH = 'landscape/nodes_with_umap_keywords.npz'
+
 # Load the nodes with keywords data
 with open('data/nodes_keywords.json', 'r', encoding='utf-8') as f:
     nodes = json.load(f)
@@ -13,25 +28,32 @@ with open('landscape/keywords_analysis.json', 'r', encoding='utf-8') as f:
 
 print(f"Total nodes: {len(nodes)}")
 
+
+def found_keywords(analysis):
+    """All design and critical keywords found in an analysis, in order (with repeats)"""
+    words = []
+    for section in ('design_keywords_found', 'critical_keywords_found'):
+        for category, category_words in analysis.get(section, {}).items():
+            words.extend(category_words)
+    return words
+
+
+# Index the analyses by URL once (the first result for a URL wins), so each
+# node finds its analysis with a lookup instead of a scan of all results
+analysis_by_url = {}
+
 # Build a comprehensive keyword dictionary from all combinations found
 keyword_combinations = defaultdict(int)
 
 for result in keywords_data.get('results', []):
+    analysis_by_url.setdefault(result['url'], result.get('analysis'))
     analysis = result.get('analysis')
     if not analysis:
         continue
-    
-    # Count all design keywords found
-    design_keywords = analysis.get('design_keywords_found', {})
-    for category, words in design_keywords.items():
-        for word in words:
-            keyword_combinations[word] += 1
-    
-    # Count all critical keywords found
-    critical_keywords = analysis.get('critical_keywords_found', {})
-    for category, words in critical_keywords.items():
-        for word in words:
-            keyword_combinations[word] += 1
+
+    # Count all design and critical keywords found
+    for word in found_keywords(analysis):
+        keyword_combinations[word] += 1
 
 # Sort by frequency and create feature list
 sorted_keywords = sorted(keyword_combinations.items(), key=lambda x: x[1], reverse=True)
@@ -40,52 +62,27 @@ feature_keywords = [kw for kw, count in sorted_keywords]
 print(f"Total unique keywords found: {len(feature_keywords)}")
 print(f"Top 20 keywords: {feature_keywords[:20]}")
 
-# Create embeddings for each node based on keyword presence
-embeddings = []
-node_urls = []
+# Binary keyword-presence features for each node, as a sparse CSR matrix:
+# row i holds a 1 in the column of every keyword found for node i
+feature_index = {keyword: i for i, keyword in enumerate(feature_keywords)}
+indptr = [0]
+indices = []
 
 for node in nodes:
-    url = node['url']
-    analysis_data = None
-    
-    # Find the corresponding analysis for this node
-    for result in keywords_data.get('results', []):
-        if result['url'] == url:
-            analysis_data = result.get('analysis')
-            break
-    
-    # Create embedding vector
-    embedding = np.zeros(len(feature_keywords))
-    
+    analysis_data = analysis_by_url.get(node['url'])
     if analysis_data:
-        # Get all keywords for this node
-        found_keywords = set()
-        
-        design_keywords = analysis_data.get('design_keywords_found', {})
-        for category, words in design_keywords.items():
-            for word in words:
-                found_keywords.add(word)
-        
-        critical_keywords = analysis_data.get('critical_keywords_found', {})
-        for category, words in critical_keywords.items():
-            for word in words:
-                found_keywords.add(word)
-        
-        # Set embedding dimensions for found keywords
-        for i, keyword in enumerate(feature_keywords):
-            if keyword in found_keywords:
-                embedding[i] = 1.0
-    
-    embeddings.append(embedding)
-    node_urls.append(url)
-
-# Convert to numpy array
-embeddings_array = np.array(embeddings)
-print(f"Embedding shape: {embeddings_array.shape}")
+        indices.extend(sorted({feature_index[word] for word in found_keywords(analysis_data)}))
+    indptr.append(len(indices))
+
+embeddings_array = sparse.csr_matrix(
+    (np.ones(len(indices), dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+    shape=(len(nodes), len(feature_keywords)),
+)
+print(f"Embedding shape: {embeddings_array.shape} ({embeddings_array.nnz} keywords set, sparse)")
 
 # Generate UMAP coordinates
 print("\nGenerating UMAP embeddings...")
-umap_model = UMAP(n_components=2, random_state=42, n_neighbors=15, min_dist=0.1)
+umap_model = UMAP(n_components=2, random_state=42, n_neighbors=15, min_dist=0.1, metric=METRIC)
 umap_coordinates = umap_model.fit_transform(embeddings_array)
 
 print(f"UMAP coordinates shape: {umap_coordinates.shape}")
@@ -111,10 +108,9 @@ for i, node in enumerate(nodes):
     output_nodes.append(new_node)
 
 # Save the result
-with open('landscape/nodes_with_umap_keywords.json', 'w', encoding='utf-8') as f:
-    json.dump(output_nodes, f, ensure_ascii=False, indent=2)
+write_records(output_nodes, OUTPUT_PATH)
 
-print(f"\n✓ Saved {len(output_nodes)} nodes with UMAP coordinates to nodes_with_umap_keywords.json")
+print(f"\n✓ Saved {len(output_nodes)} nodes with UMAP coordinates to {OUTPUT_PATH}")
 
 # Print sample
 print("\nFirst 3 nodes with UMAP coordinates:")
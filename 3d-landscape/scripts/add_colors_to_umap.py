@@ -1,52 +1,12 @@
 import json
-from collections import Counter
 
-# Load keywords_precomputed.json to map variants to main keywords
-with open('3DUMAP/data/keywords_precomputed.json', 'r', encoding='utf-8') as f:
-    kp = json.load(f)
+from keyword_counts import load_keyword_counts
+from keyword_vocabulary import load_vocabulary
 
-# Load colorsnew.json for the color mapping
-with open('3DUMAP/data/colorsnew.json', 'r', encoding='utf-8') as f:
-    color_map = json.load(f)
+# Variant -> main keyword and keyword -> color mappings, shared with the other scripts
+vocabulary = load_vocabulary('3DUMAP/data/keywords_precomputed.json', '3DUMAP/data/colorsnew.json')
 
-# Build reverse mapping: variant -> main keyword
-variant_to_main = {}
-
-# From embedded_keywords
-for main_kw, variants in kp.get('embedded_keywords', {}).items():
-    if isinstance(variants, list):
-        for variant in variants:
-            variant_to_main[variant.lower()] = main_kw
-
-# From speculative_keywords
-for main_kw, variants in kp.get('speculative_keywords', {}).items():
-    if isinstance(variants, list):
-        for variant in variants:
-            variant_to_main[variant.lower()] = main_kw
-
-# From critique_keywords
-for main_kw, variants in kp.get('critique_keywords', {}).items():
-    if isinstance(variants, list):
-        for variant in variants:
-            variant_to_main[variant.lower()] = main_kw
-
-# Also add contextual_scores keys as main keywords
-contextual = kp.get('contextual_scores', {})
-for section in contextual.values():
-    for main_kw in section.keys():
-        variant_to_main[main_kw.lower()] = main_kw
-
-print(f"Built mapping for {len(variant_to_main)} variants to main keywords")
-
-# Function to get most frequent keyword
-def get_most_frequent_keyword(keyword_array):
-    if not keyword_array:
-        return None
-    counts = Counter(keyword_array)
-    most_common = counts.most_common(1)
-    if most_common:
-        return most_common[0][0]
-    return keyword_array[0]
+print(f"Built mapping for {len(vocabulary.variant_to_main)} variants to main keywords")
 
 # Load umap_3d_data.json
 with open('3DUMAP/data/umap_3d_data.json', 'r', encoding='utf-8') as f:
@@ -54,6 +14,9 @@ with open('3DUMAP/data/umap_3d_data.json', 'r', encoding='utf-8') as f:
 
 print(f"Loaded {len(data)} sentences from umap_3d_data.json")
 
+# Most frequent keyword of every sentence, from the sparse keyword count matrix
+most_frequent = load_keyword_counts('3DUMAP/data/umap_3d_data.json', data).dominant_keywords()
+
 # Add color to each sentence
 color_count = {
     'found': 0,
@@ -61,31 +24,20 @@ color_count = {
     'colors_used': set()
 }
 
-for i, item in enumerate(data):
+for i, (item, most_freq) in enumerate(zip(data, most_frequent)):
     if i % 500 == 0:
         print(f"Processing {i}/{len(data)}...")
     
-    # Get keywords for this sentence
-    keywords = item.get('keyword', [])
-    if not keywords:
-        continue
-    
-    # Get the most frequent keyword
-    most_freq = get_most_frequent_keyword(keywords)
+    # Sentences without keywords have no most frequent keyword
     if not most_freq:
         continue
     
-    # Map to main keyword
-    main_keyword = variant_to_main.get(most_freq.lower())
-    if not main_keyword:
-        color_count['not_found'] += 1
-        continue
-    
-    # Get color for main keyword
-    if main_keyword in color_map:
-        item['color'] = color_map[main_keyword]
+    # Get color for the keyword's main keyword
+    color = vocabulary.color(most_freq)
+    if color is not None:
+        item['color'] = color
         color_count['found'] += 1
-        color_count['colors_used'].add(main_keyword)
+        color_count['colors_used'].add(vocabulary.main_keyword(most_freq))
     else:
         color_count['not_found'] += 1
 
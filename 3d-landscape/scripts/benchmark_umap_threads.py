@@ -0,0 +1,129 @@
+"""
+Benchmark the multi-threaded UMAP path against the seeded single-threaded one.
+
+Lays out the sentences of umap_3d_data.json with the pipeline's UMAP
+parameters, from the cached embeddings and kNN graph, --repeats times on one
+thread (random_state=42, as the pipeline runs by default) and on --threads
+threads (seeded global RNG, see umap_threads). Threaded layouts are aligned
+onto the single-threaded one. Reports the fastest wall-clock time of each
+path (the first run includes numba compilation), how far repeated threaded
+runs differ from each other (they are not reproducible, so this is their
+run-to-run variation, not an error) and how far they are from the
+single-threaded layout.
+
+Run from 3d-landscape/, after compute_3d_umap_filtered.py:
+    python scripts/benchmark_umap_threads.py --threads 8
+"""
+
+import argparse
+import time
+import warnings
+from pathlib import Path
+
+import numpy as np
+
+from columnar_records import load_table
+from compute_3d_umap_filtered import UMAP_PARAMS
+from embedding_cache import default_cache_dir, encode_sentences
+from knn_graph import cached_knn, default_knn_cache_dir
+from layout_alignment import apply_alignment, fit_alignment
+from sentence_dedup import deduplicate
+from umap_threads import seeded_global_rng, threaded_params
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threads", type=int, default=-1, help="Threads of the parallel path (default: -1, all cores)")
+    parser.add_argument("--repeats", type=int, default=2, help="Runs per path (default: 2)")
+    parser.add_argument("--input", type=Path, default=None, help="Default: 3DUMAP/data/umap_3d_data.json")
+    return parser.parse_args()
+
+
+def run_layout(embeddings, knn, threads):
+    """(seconds, coords) of one fit with the pipeline's parameters"""
+    import umap
+
+    start = time.perf_counter()
+    with warnings.catch_warnings(), seeded_global_rng(UMAP_PARAMS["random_state"]):
+        warnings.simplefilter("ignore")
+        reducer = umap.UMAP(
+            **threaded_params(UMAP_PARAMS, threads),
+            # UMAP edits the graph in place, every run gets its own copy
+            precomputed_knn=(knn[0].copy(), knn[1].copy(), knn[2]),
+        )
+        coords = reducer.fit_transform(embeddings)
+    return time.perf_counter() - start, coords
+
+
+def median_distance(a, b):
+    return float(np.median(np.linalg.norm(a[:, :2] - b[:, :2], axis=1)))
+
+
+def main():
+    args = parse_args()
+
+    script_dir = Path(__file__).parent
+    root_dir = script_dir.parent
+    data_dir = root_dir / "3DUMAP" / "data"
+    input_path = args.input or data_dir / "umap_3d_data.json"
+
+    # ========================================================================
+    # STEP 1: Load embeddings and the kNN graph
+    # ========================================================================
+    print(f"Loading {input_path}...")
+    sentences = load_table(input_path).values("sentence")
+
+    representatives, _ = deduplicate(sentences)
+    embeddings = encode_sentences([sentences[i] for i in representatives], default_cache_dir(data_dir))
+    print(f"Embeddings shape: {embeddings.shape}")
+    knn = cached_knn(
+        embeddings,
+        UMAP_PARAMS["n_neighbors"],
+        UMAP_PARAMS["metric"],
+        default_knn_cache_dir(data_dir),
+        UMAP_PARAMS["random_state"],
+    )
+
+    # ========================================================================
+    # STEP 2: Time both paths
+    # ========================================================================
+    serial_runs = []
+    for repeat in range(args.repeats):
+        seconds, coords = run_layout(embeddings, knn, 1)
+        print(f"  single thread, run {repeat + 1}: {seconds:.1f}s")
+        serial_runs.append((seconds, coords))
+    reference = serial_runs[0][1]
+    all_rows = np.arange(len(reference))
+
+    # Capped at the cores numba can use
+    threads = threaded_params(UMAP_PARAMS, args.threads)["n_jobs"]
+    label = "all threads" if threads < 1 else f"{threads} threads"
+    threaded_runs = []
+    for repeat in range(args.repeats):
+        seconds, coords = run_layout(embeddings, knn, args.threads)
+        coords = apply_alignment(fit_alignment(coords, reference, all_rows), coords)
+        print(f"  {label}, run {repeat + 1}: {seconds:.1f}s")
+        threaded_runs.append((seconds, coords))
+
+    # ========================================================================
+    # STEP 3: Summary
+    # ========================================================================
+    spread = float(reference[:, :2].std())
+    serial_time = min(seconds for seconds, _ in serial_runs)
+    threaded_time = min(seconds for seconds, _ in threaded_runs)
+    print(f"\nFastest single-threaded fit: {serial_time:.1f}s")
+    print(f"Fastest fit on {label}: {threaded_time:.1f}s "
+          f"({serial_time / threaded_time:.2f}x)")
+    print(f"Layout spread (std of x/y): {spread:.3f}")
+    if len(serial_runs) > 1:
+        print(f"Single-threaded runs differ by (median point distance): "
+              f"{median_distance(serial_runs[0][1], serial_runs[1][1]):.4f}")
+    if len(threaded_runs) > 1:
+        print(f"Threaded runs differ from each other (not reproducible, median point distance, "
+              f"aligned): {median_distance(threaded_runs[0][1], threaded_runs[1][1]):.4f}")
+    print(f"Threaded vs single-threaded layout (median point distance, aligned): "
+          f"{median_distance(threaded_runs[0][1], reference):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+Columnar store for record files (sentences_with_positions, umap_3d_data,
+nodes_with_umap_keywords): one .npz file instead of a JSON array.
+
+RecordTable keeps every field of the records as a column:
+  - numbers and booleans as typed arrays (int64, float64, bool)
+  - strings (sentence, url, group, ...) dictionary-encoded: uint32 codes into
+    the column's distinct values, stored as one UTF-8 buffer with offsets
+  - lists of strings (keyword lists) as ragged row offsets into one code array
+  - anything else (e.g. keywordCounts dicts) as dictionary-encoded JSON text
+Fields some records lack or set to null are kept as masks, and records
+whose keys are not in first-seen field order keep their own key order, so
+records() gives back the records that went in, keys in the same order.
+
+Loading reads a handful of arrays instead of parsing every record, and a
+column (table.array("x"), table.values("url")) is available without building
+the records. write_records() picks the format by suffix (the store for .npz,
+JSON otherwise), and sentence_records.iter_records() reads both, so stages
+pass the store between them and only the browser export is JSON:
+    python scripts/columnar_records.py data/sentences_with_positions.json        # -> .npz
+    python scripts/columnar_records.py 3DUMAP/data/umap_3d_data.npz umap_3d_data.json
+"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+STORE_SUFFIX = ".npz"
+
+NUMERIC_DTYPES = {"bool": bool, "int": np.int64, "float": np.float64}
+
+# Value stored in rows that are missing or null, per kind
+PLACEHOLDERS = {"bool": False, "int": 0, "float": 0.0, "string": "", "string_list": [], "json": "null"}
+
+
+def _column_kind(values):
+    """Storage kind for the (non-null) values of a field"""
+    if all(isinstance(value, bool) for value in values):
+        return "bool"
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return "int"
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return "float"
+    if all(isinstance(value, str) for value in values):
+        return "string"
+    if all(isinstance(value, list) and all(isinstance(item, str) for item in value) for value in values):
+        return "string_list"
+    return "json"
+
+
+def _encode_strings(strings):
+    """(codes, buffer, offsets): strings dictionary-encoded in first-seen order"""
+    index = {}
+    codes = np.fromiter((index.setdefault(string, len(index)) for string in strings), dtype=np.uint32)
+    encoded = [string.encode("utf-8") for string in index]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    buffer = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return codes, buffer, offsets
+
+
+def _decode_strings(buffer, offsets):
+    """Dictionary of a string column, as a list"""
+    data = buffer.tobytes()
+    bounds = offsets.tolist()
+    return [data[start:end].decode("utf-8") for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _encode_column(raw, present):
+    """Arrays of one field, from its value per row and whether the row has the field"""
+    null = [has and value is None for value, has in zip(raw, present)]
+    valid = [has and value is not None for value, has in zip(raw, present)]
+    kind = _column_kind([value for value, ok in zip(raw, valid) if ok])
+    placeholder = PLACEHOLDERS[kind]
+    filled = [value if ok else placeholder for value, ok in zip(raw, valid)]
+
+    arrays = {}
+    if kind in NUMERIC_DTYPES:
+        arrays["values"] = np.array(filled, dtype=NUMERIC_DTYPES[kind])
+        if kind == "float":
+            integral = [isinstance(value, int) for value in filled]
+            if any(integral):
+                arrays["integral"] = np.array(integral, dtype=bool)
+    elif kind == "string_list":
+        arrays["row_offsets"] = np.zeros(len(filled) + 1, dtype=np.int64)
+        arrays["row_offsets"][1:] = np.cumsum([len(value) for value in filled])
+        arrays["codes"], arrays["buffer"], arrays["offsets"] = _encode_strings(
+            item for value in filled for item in value
+        )
+    else:
+        strings = filled if kind == "string" else (
+            json.dumps(value, ensure_ascii=False) if ok else value for value, ok in zip(filled, valid)
+        )
+        arrays["codes"], arrays["buffer"], arrays["offsets"] = _encode_strings(strings)
+
+    if not all(present):
+        arrays["missing"] = ~np.array(present, dtype=bool)
+    if any(null):
+        arrays["null"] = np.array(null, dtype=bool)
+    return kind, arrays
+
+
+class RecordTable:
+    """Records (dicts with the same kind of value per field) stored column by column"""
+
+    def __init__(self, n_rows, kinds, columns, key_orders=None):
+        self.n_rows = n_rows
+        self.kinds = kinds  # field -> kind, in first-seen field order
+        self.columns = columns  # field -> {part: array}
+        # (distinct key orders as field number tuples, order number per row),
+        # None when every record has its keys in first-seen field order
+        self.key_orders = key_orders
+
+    def __len__(self):
+        return self.n_rows
+
+    @property
+    def fields(self):
+        return list(self.kinds)
+
+    @classmethod
+    def from_records(cls, records):
+        records = list(records)
+        fields = list(dict.fromkeys(field for record in records for field in record))
+        kinds = {}
+        columns = {}
+        for field in fields:
+            present = [field in record for record in records]
+            raw = [record.get(field) for record in records]
+            kinds[field], columns[field] = _encode_column(raw, present)
+
+        numbers = {field: i for i, field in enumerate(fields)}
+        row_orders = [tuple(numbers[field] for field in record) for record in records]
+        key_orders = None
+        if any(list(order) != sorted(order) for order in row_orders):
+            distinct = {}
+            codes = np.fromiter((distinct.setdefault(order, len(distinct)) for order in row_orders),
+                                dtype=np.uint32, count=len(row_orders))
+            key_orders = (list(distinct), codes)
+        return cls(len(records), kinds, columns, key_orders)
+
+    def array(self, field):
+        """Typed array of a number or boolean field (placeholders in missing and null rows)"""
+        if self.kinds[field] not in NUMERIC_DTYPES:
+            raise ValueError(f"{field} is a {self.kinds[field]} column, not a number column")
+        return self.columns[field]["values"]
+
+    def values(self, field):
+        """Value of a field per row, None where it is missing or null"""
+        kind = self.kinds[field]
+        column = self.columns[field]
+        if kind in NUMERIC_DTYPES:
+            values = column["values"].tolist()
+            if "integral" in column:
+                values = [int(value) if integral else value
+                          for value, integral in zip(values, column["integral"].tolist())]
+        else:
+            dictionary = _decode_strings(column["buffer"], column["offsets"])
+            codes = column["codes"].tolist()
+            if kind == "string":
+                values = [dictionary[code] for code in codes]
+            elif kind == "string_list":
+                items = [dictionary[code] for code in codes]
+                bounds = column["row_offsets"].tolist()
+                values = [items[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+            else:
+                # Parsed per row, so rows never share a mutable value
+                values = [json.loads(dictionary[code]) for code in codes]
+
+        for mask in ("missing", "null"):
+            if mask in column:
+                for row in np.flatnonzero(column[mask]).tolist():
+                    values[row] = None
+        return values
+
+    def records(self):
+        """The records as dicts, keys in the order they had"""
+        columns = [
+            (field, self.values(field), self.columns[field].get("missing"))
+            for field in self.kinds
+        ]
+        if self.key_orders is not None:
+            orders, codes = self.key_orders
+            for row, code in enumerate(codes.tolist()):
+                yield {columns[i][0]: columns[i][1][row] for i in orders[code]}
+            return
+        for row in range(self.n_rows):
+            yield {
+                field: values[row]
+                for field, values, missing in columns
+                if missing is None or not missing[row]
+            }
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        schema = {"n_rows": self.n_rows, "fields": [[field, kind] for field, kind in self.kinds.items()]}
+        arrays = {}
+        if self.key_orders is not None:
+            schema["key_orders"] = [list(order) for order in self.key_orders[0]]
+            arrays["key_order_codes"] = self.key_orders[1]
+        arrays["schema"] = np.array(json.dumps(schema, ensure_ascii=False))
+        for i, field in enumerate(self.kinds):
+            for part, array in self.columns[field].items():
+                arrays[f"c{i}_{part}"] = array
+        # Uncompressed: loading is a plain read of every array
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp{STORE_SUFFIX}")
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as npz:
+            schema = json.loads(str(npz["schema"]))
+            kinds = {}
+            columns = {}
+            for i, (field, kind) in enumerate(schema["fields"]):
+                prefix = f"c{i}_"
+                kinds[field] = kind
+                columns[field] = {
+                    name[len(prefix):]: npz[name] for name in npz.files if name.startswith(prefix)
+                }
+            key_orders = None
+            if "key_orders" in schema:
+                key_orders = ([tuple(order) for order in schema["key_orders"]], npz["key_order_codes"])
+        return cls(schema["n_rows"], kinds, columns, key_orders)
+
+
+def is_store(path):
+    return Path(path).suffix == STORE_SUFFIX
+
+
+def load_table(path):
+    """RecordTable of a store file, or of the records of a JSON file"""
+    if is_store(path):
+        return RecordTable.load(path)
+    from sentence_records import iter_records
+
+    return RecordTable.from_records(iter_records(path))
+
+
+def write_records(records, path):
+    """
+    Write records to the store (.npz) or as a JSON array laid out like
+    json.dump(records, indent=2, ensure_ascii=False), one record at a time.
+    Returns the number of records.
+    """
+    path = Path(path)
+    if is_store(path):
+        table = RecordTable.from_records(records)
+        table.save(path)
+        return len(table)
+
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for record in records:
+            f.write(",\n  " if count else "\n  ")
+            f.write(json.dumps(record, indent=2, ensure_ascii=False).replace("\n", "\n  "))
+            count += 1
+        f.write("\n]" if count else "]")
+    os.replace(tmp_path, path)
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: python {sys.argv[0]} <input.json|.npz> [output.npz|.json]")
+        sys.exit(1)
+
+    from sentence_records import iter_records
+
+    input_path = Path(sys.argv[1])
+    if len(sys.argv) == 3:
+        output_path = Path(sys.argv[2])
+    else:
+        output_path = input_path.with_suffix(".json" if is_store(input_path) else STORE_SUFFIX)
+    count = write_records(iter_records(input_path), output_path)
+    print(f"✓ Wrote {count} records to {output_path}")
@@ -3,16 +3,39 @@
 Compute 3D UMAP layout for critical design sentences.
 Lightweight version using TF-IDF instead of neural embeddings.
 Follows PAIR/Fashion-UMAP pattern.
+
+Sentences are streamed in chunks (see sentence_records) and the TF-IDF
+matrix stays sparse (see streaming_tfidf): one pass collects term statistics
+and keyword counts, a second builds the TF-IDF rows, a third writes the
+export. TruncatedSVD reduces the sparse matrix before UMAP.
 """
 
 import json
-import re
 from pathlib import Path
-from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy import sparse
 import umap
 
+from keyword_counts import KeywordCounts
+from keyword_matcher import KeywordMatcher
+from pre_reduction import cached_reduction, default_reduction_cache_dir
+from sentence_records import DEFAULT_CHUNK_SIZE, iter_chunks, iter_records, iter_sentences
+from streaming_tfidf import TermCounter, tfidf_rows
+
+# TF-IDF vocabulary, as TfidfVectorizer parameters
+MAX_FEATURES = 384
+MIN_DF = 2
+MAX_DF = 0.8
+NGRAM_RANGE = (1, 2)
+
+# Reduce TF-IDF columns before UMAP: None (UMAP on the sparse matrix),
+# "pca" (TruncatedSVD on sparse input) or "random-projection"
+PRE_REDUCE = "pca"
+PRE_REDUCE_DIM = 50
+
+CHUNK_SIZE = DEFAULT_CHUNK_SIZE
+
 # ============================================================================
-# STEP 1: Load data
+# STEP 1: Load keywords
 # ============================================================================
 
 print("=" * 70)
@@ -22,42 +45,9 @@ print("=" * 70)
 sentences_path = Path("data/sentences_with_positions.json")
 keywords_path = Path("data/keywords.json")
 
-with open(sentences_path, "r", encoding="utf-8") as f:
-    sentences_data = json.load(f)
-
 with open(keywords_path, "r", encoding="utf-8") as f:
     keywords_data = json.load(f)
 
-print(f"\n✓ Loaded {len(sentences_data)} sentences")
-
-# ============================================================================
-# STEP 2: Create embeddings using TF-IDF
-# ============================================================================
-
-print("\nComputing TF-IDF embeddings...")
-
-sentences_list = [d["sentence"] for d in sentences_data]
-
-vectorizer = TfidfVectorizer(
-    max_features=384,
-    min_df=2,
-    max_df=0.8,
-    ngram_range=(1, 2)
-)
-
-embeddings = vectorizer.fit_transform(sentences_list).toarray()
-print(f"✓ Embeddings shape: {embeddings.shape}")
-
-# ============================================================================
-# STEP 3: Compute embeddedness ↔ speculation scores
-# ============================================================================
-
-# ============================================================================
-# STEP 3: Compute embeddedness ↔ speculation scores
-# ============================================================================
-
-print("\nScoring embeddedness vs speculation...")
-
 embedded_keywords = []
 speculative_keywords = []
 
@@ -78,41 +68,64 @@ for group_name, keywords_list in keywords_data.get("design_keywords_found", {}).
 embedded_keywords = list(set([kw.lower() for kw in embedded_keywords]))
 speculative_keywords = list(set([kw.lower() for kw in speculative_keywords]))
 
-print(f"✓ Embedded keywords (context-based): {len(embedded_keywords)}")
+print(f"\n✓ Embedded keywords (context-based): {len(embedded_keywords)}")
 print(f"✓ Speculative keywords (design/futures): {len(speculative_keywords)}")
 
-# Create regex patterns for word boundary matching
-def count_keyword_occurrences(sentence, keywords):
-    """Count keyword occurrences using word boundaries"""
-    sentence_lower = sentence.lower()
-    count = 0
-    for kw in keywords:
-        # Use word boundaries to match whole words
-        pattern = r'\b' + re.escape(kw) + r'\b'
-        matches = re.findall(pattern, sentence_lower)
-        count += len(matches)
-    return count
-
-embedded_speculative_scores = []
-for d in sentences_data:
-    sentence = d["sentence"]
-    
-    # Count keyword occurrences with proper word boundaries
-    embedded_count = count_keyword_occurrences(sentence, embedded_keywords)
-    speculative_count = count_keyword_occurrences(sentence, speculative_keywords)
-    
-    total = embedded_count + speculative_count
-    if total == 0:
-        score = 0.5
-    else:
-        score = speculative_count / total
-    
-    embedded_speculative_scores.append(score)
+# Count keyword occurrences with word boundaries (phrases included) into a
+# sparse sentences x keywords matrix, scanning each sentence once
+matcher = KeywordMatcher(
+    {kw: 0.0 for kw in embedded_keywords + speculative_keywords},
+    phrase_boundaries=True,
+)
+
+# ============================================================================
+# STEP 2: Stream sentences: term statistics and keyword counts
+# ============================================================================
+
+print("\nReading sentences...")
+
+term_counter = TermCounter(ngram_range=NGRAM_RANGE)
+keyword_count_chunks = []
+for chunk in iter_chunks(iter_sentences(sentences_path), CHUNK_SIZE):
+    term_counter.update(chunk)
+    keyword_count_chunks.append(KeywordCounts.from_matcher(matcher, chunk))
+    print(f"  {term_counter.n_docs} sentences read")
+
+print(f"\n✓ Loaded {term_counter.n_docs} sentences")
+
+# ============================================================================
+# STEP 3: Create embeddings using TF-IDF
+# ============================================================================
+
+print("\nComputing TF-IDF embeddings...")
+
+vocabulary, idf = term_counter.vocabulary(max_features=MAX_FEATURES, min_df=MIN_DF, max_df=MAX_DF)
+embeddings = sparse.vstack([
+    tfidf_rows(chunk, vocabulary, idf, NGRAM_RANGE)
+    for chunk in iter_chunks(iter_sentences(sentences_path), CHUNK_SIZE)
+], format="csr")
+print(f"✓ Embeddings shape: {embeddings.shape} ({embeddings.nnz} non-zeros)")
+
+if PRE_REDUCE:
+    embeddings, _ = cached_reduction(
+        embeddings, PRE_REDUCE, PRE_REDUCE_DIM, default_reduction_cache_dir("3DUMAP/data")
+    )
+
+# ============================================================================
+# STEP 4: Compute embeddedness ↔ speculation scores
+# ============================================================================
+
+print("\nScoring embeddedness vs speculation...")
+
+keyword_counts = KeywordCounts.concatenate(keyword_count_chunks)
+
+# Speculative share of embedded + speculative occurrences, 0.5 when there are none
+embedded_speculative_scores = keyword_counts.ratio(speculative_keywords, embedded_keywords)
 
 print(f"✓ Scored {len(embedded_speculative_scores)} sentences")
 
 # ============================================================================
-# STEP 4: Run 3D UMAP
+# STEP 5: Run 3D UMAP
 # ============================================================================
 
 print("\nRunning 3D UMAP reduction...")
@@ -129,31 +142,35 @@ coordinates_3d = umap_3d.fit_transform(embeddings)
 print(f"✓ 3D coordinates computed: {coordinates_3d.shape}")
 
 # ============================================================================
-# STEP 5: Export to JSON
+# STEP 6: Export to JSON
 # ============================================================================
 
 print("\nExporting to JSON...")
 
-output_data = []
-for i, d in enumerate(sentences_data):
-    output_data.append({
-        "sentence": d["sentence"],
-        "url": d["url"],
-        "keyword": d["keyword"],
-        "embedded_speculative": float(embedded_speculative_scores[i]),
-        "x": float(coordinates_3d[i, 0]),
-        "y": float(coordinates_3d[i, 1]),
-        "z": float(coordinates_3d[i, 2])
-    })
-
 output_path = Path("3DUMAP/data/umap_3d_data.json")
 output_path.parent.mkdir(parents=True, exist_ok=True)
 
+# Written record by record, same layout as json.dump of the whole list
+exported = 0
 with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(output_data, f)
+    f.write("[")
+    for i, d in enumerate(iter_records(sentences_path)):
+        if i:
+            f.write(", ")
+        json.dump({
+            "sentence": d["sentence"],
+            "url": d["url"],
+            "keyword": d["keyword"],
+            "embedded_speculative": float(embedded_speculative_scores[i]),
+            "x": float(coordinates_3d[i, 0]),
+            "y": float(coordinates_3d[i, 1]),
+            "z": float(coordinates_3d[i, 2])
+        }, f)
+        exported += 1
+    f.write("]")
 
 file_size_mb = output_path.stat().st_size / 1024 / 1024
-print(f"✓ Exported {len(output_data)} points to {output_path}")
+print(f"✓ Exported {exported} points to {output_path}")
 print(f"✓ File size: {file_size_mb:.2f} MB")
 
 print("\n" + "=" * 70)
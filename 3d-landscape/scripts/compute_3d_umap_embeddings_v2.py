@@ -7,9 +7,11 @@ import re
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 import umap
 
+from embedding_cache import default_cache_dir, encode_sentences
+from sentence_dedup import deduplicate
+
 # ============================================================================
 # STEP 1: Load sentences and contextual scores
 # ============================================================================
@@ -35,8 +37,13 @@ print(f"Loaded {len(sentences)} sentences")
 # STEP 2: Embed sentences using sentence transformer
 # ============================================================================
 print("Computing embeddings (this may take a few minutes)...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(sentences, show_progress_bar=True)
+# Repeated sentences are embedded and laid out once, coordinates are fanned out after UMAP
+representatives, inverse = deduplicate(sentences)
+print(f"Unique sentences: {len(representatives)} ({len(sentences) - len(representatives)} duplicates)")
+# Only sentences without a cached embedding are encoded; the model loads only if needed
+embeddings = encode_sentences(
+    [sentences[i] for i in representatives], default_cache_dir(root_dir / "3DUMAP" / "data")
+)
 
 print(f"Embeddings shape: {embeddings.shape}")
 
@@ -142,7 +149,7 @@ umap_3d = umap.UMAP(
     random_state=42
 )
 
-coords = umap_3d.fit_transform(embeddings)
+coords = umap_3d.fit_transform(embeddings)[inverse]
 
 df["x"] = coords[:, 0]
 df["y"] = coords[:, 1]
@@ -4,13 +4,15 @@ Searches for ALL keywords from keywords_precomputed.json
 """
 
 import json
-import re
 import pandas as pd
 import numpy as np
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
 import umap
 
+from embedding_cache import default_cache_dir, encode_sentences
+from keyword_vocabulary import load_vocabulary
+from sentence_dedup import deduplicate
+
 # ============================================================================
 # STEP 1: Load sentences and keywords
 # ============================================================================
@@ -24,8 +26,7 @@ with open(root_dir / "data" / "sentences_with_positions.json", "r", encoding="ut
     sentences_data = json.load(f)
 
 print("Loading keywords...")
-with open(root_dir / "3DUMAP" / "data" / "keywords_precomputed.json", "r", encoding="utf-8") as f:
-    keywords_precomputed = json.load(f)
+vocabulary = load_vocabulary(root_dir / "3DUMAP" / "data" / "keywords_precomputed.json")
 
 df = pd.DataFrame(sentences_data)
 sentences = df["sentence"].tolist()
@@ -37,36 +38,9 @@ print(f"Loaded {len(sentences)} sentences")
 # ============================================================================
 print("Extracting all keywords...")
 
-# Collect all keywords from all sections
-all_keywords_dict = {}  # keyword -> score
-
-# Add contextual scores (these have explicit scores)
-contextual_scores = keywords_precomputed.get("contextual_scores", {})
-embedded_scores = contextual_scores.get("embeddedness_keywords", {})
-speculative_scores = contextual_scores.get("speculative_keywords", {})
-
-for keyword, score in embedded_scores.items():
-    all_keywords_dict[keyword.lower()] = score
-
-for keyword, score in speculative_scores.items():
-    all_keywords_dict[keyword.lower()] = score
-
-# Also extract keywords from the embedded_keywords, speculative_keywords, critique_keywords sections
-# (the sections with lists of keyword variations)
-for section_name in ["embedded_keywords", "speculative_keywords", "critique_keywords"]:
-    section = keywords_precomputed.get(section_name, {})
-    for key_name, keyword_list in section.items():
-        if isinstance(keyword_list, list):
-            for keyword_variant in keyword_list:
-                kw_lower = keyword_variant.lower()
-                # If not already in dict, assign score based on category
-                if kw_lower not in all_keywords_dict:
-                    if section_name == "embedded_keywords":
-                        all_keywords_dict[kw_lower] = -0.5  # Default embedded score
-                    elif section_name == "speculative_keywords":
-                        all_keywords_dict[kw_lower] = 0.5   # Default speculative score
-                    else:  # critique_keywords
-                        all_keywords_dict[kw_lower] = 0.0   # Neutral for critique
+# keyword -> score, shared with the other pipeline scripts. Variants take the
+# contextual score of their main keyword, or their section's default score.
+all_keywords_dict = vocabulary.keyword_scores
 
 print(f"Total keywords to search for: {len(all_keywords_dict)}")
 print(f"Sample keywords: {list(all_keywords_dict.keys())[:10]}")
@@ -76,43 +50,15 @@ print(f"Sample keywords: {list(all_keywords_dict.keys())[:10]}")
 # ============================================================================
 print("Searching for keywords in sentences...")
 
+# All keywords compiled into one automaton so each sentence is scanned once
+matcher = vocabulary.matcher
+
 def find_keywords_in_sentence(sentence):
     """
     Find all keywords in the sentence.
     Returns list of found keywords and their average score.
     """
-    sentence_lower = sentence.lower()
-    
-    # Sort by length (longest first) to handle multi-word phrases better
-    sorted_keywords = sorted(all_keywords_dict.keys(), key=len, reverse=True)
-    
-    found_keywords = []
-    score_sum = 0.0
-    matched_set = set()
-    
-    for keyword in sorted_keywords:
-        if keyword in matched_set:
-            continue
-            
-        try:
-            if ' ' in keyword:  # Multi-word phrase
-                if keyword in sentence_lower:
-                    matched_set.add(keyword)
-                    found_keywords.append(keyword)
-                    score_sum += all_keywords_dict[keyword]
-            else:  # Single word
-                pattern = r'\b' + re.escape(keyword) + r'\b'
-                if re.search(pattern, sentence_lower):
-                    matched_set.add(keyword)
-                    found_keywords.append(keyword)
-                    score_sum += all_keywords_dict[keyword]
-        except Exception as e:
-            pass
-    
-    # Calculate average score
-    avg_score = score_sum / len(found_keywords) if found_keywords else 0.0
-    
-    return found_keywords, avg_score
+    return matcher.find(sentence, repeat=False)
 
 # Apply keyword finding to all sentences
 keywords_list = []
@@ -138,8 +84,13 @@ print(f"  Max: {df['embedded_speculative'].max():.3f}")
 # STEP 4: Embed sentences using sentence transformer
 # ============================================================================
 print("Computing embeddings (this may take a few minutes)...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(sentences, show_progress_bar=True)
+# Repeated sentences are embedded and laid out once, coordinates are fanned out after UMAP
+representatives, inverse = deduplicate(sentences)
+print(f"Unique sentences: {len(representatives)} ({len(sentences) - len(representatives)} duplicates)")
+# Only sentences without a cached embedding are encoded; the model loads only if needed
+embeddings = encode_sentences(
+    [sentences[i] for i in representatives], default_cache_dir(root_dir / "3DUMAP" / "data")
+)
 
 print(f"Embeddings shape: {embeddings.shape}")
 
@@ -155,7 +106,7 @@ umap_3d = umap.UMAP(
     random_state=42
 )
 
-coords = umap_3d.fit_transform(embeddings)
+coords = umap_3d.fit_transform(embeddings)[inverse]
 
 df["x"] = coords[:, 0]
 df["y"] = coords[:, 1]
@@ -3,227 +3,705 @@ Compute 3D UMAP embeddings for sentences containing keywords from keywords_preco
 Only includes sentences that have at least one keyword.
 """
 
-import json
-import re
-import pandas as pd
+import argparse
 import numpy as np
+import sys
+import time
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-import umap
-
-# ============================================================================
-# STEP 1: Load sentences and keywords
-# ============================================================================
-print("Loading sentences...")
-
-# Get the parent directory of the scripts folder
-script_dir = Path(__file__).parent
-root_dir = script_dir.parent
-
-with open(root_dir / "data" / "sentences_with_positions.json", "r", encoding="utf-8") as f:
-    sentences_data = json.load(f)
-
-print("Loading keywords...")
-with open(root_dir / "3DUMAP" / "data" / "keywords_precomputed.json", "r", encoding="utf-8") as f:
-    keywords_precomputed = json.load(f)
-
-print(f"Loaded {len(sentences_data)} sentences")
-
-# ============================================================================
-# STEP 2: Extract ALL keywords and contextual scores
-# ============================================================================
-print("Extracting all keywords...")
-
-# Collect all keywords from all sections with proper scoring
-all_keywords_dict = {}  # keyword -> score
-
-# First, add contextual scores (these have explicit scores and are most important)
-contextual_scores = keywords_precomputed.get("contextual_scores", {})
-embedded_scores = contextual_scores.get("embeddedness_keywords", {})
-speculative_scores = contextual_scores.get("speculative_keywords", {})
-
-for keyword, score in embedded_scores.items():
-    all_keywords_dict[keyword.lower()] = score
-
-for keyword, score in speculative_scores.items():
-    all_keywords_dict[keyword.lower()] = score
-
-# Also extract keywords from the embedded_keywords, speculative_keywords, critique_keywords sections
-# and map them to contextual scores
-for section_name in ["embedded_keywords", "speculative_keywords", "critique_keywords"]:
-    section = keywords_precomputed.get(section_name, {})
-    for key_name, keyword_list in section.items():
-        if isinstance(keyword_list, list):
-            for keyword_variant in keyword_list:
-                kw_lower = keyword_variant.lower()
-                # If not already in dict from contextual_scores, try to map it
-                if kw_lower not in all_keywords_dict:
-                    # Try to find matching contextual score keyword
-                    found_score = None
-                    
-                    # Check if key_name exists in contextual scores
-                    if key_name.lower() in embedded_scores:
-                        found_score = embedded_scores[key_name.lower()]
-                    elif key_name.lower() in speculative_scores:
-                        found_score = speculative_scores[key_name.lower()]
-                    
-                    # If not found, assign default based on section
-                    if found_score is None:
-                        if section_name == "embedded_keywords":
-                            found_score = -0.5  # Default embedded
-                        elif section_name == "speculative_keywords":
-                            found_score = 0.5   # Default speculative
-                        else:  # critique_keywords
-                            found_score = 0.0   # Neutral
-                    
-                    all_keywords_dict[kw_lower] = found_score
-
-print(f"Total keywords to search for: {len(all_keywords_dict)}")
-
-# ============================================================================
-# STEP 3: Find keywords in sentences and filter
-# ============================================================================
-print("Searching for keywords in sentences...")
-
-def find_keywords_in_sentence(sentence):
+
+from columnar_records import load_table, write_records
+from embedding_cache import DEFAULT_MODEL, default_cache_dir, encode_sentences
+from embedding_precision import PRECISIONS, print_precision_report
+from keyword_counts import (
+    KeywordCounts,
+    counts_path_for,
+    diff_keyword_scores,
+    file_hash,
+    update_counts,
+)
+from keyword_vocabulary import load_vocabulary
+from knn_graph import cached_knn, default_knn_cache_dir
+from landmark_umap import DEFAULT_TRANSFORM_CHUNK_SIZE, landmark_layout, stratified_sample
+from layout_alignment import apply_alignment, fit_alignment
+from layout_quality import layout_report
+from pre_reduction import (
+    DEFAULT_DIMENSION,
+    METHODS,
+    apply_reduction,
+    cached_reduction,
+    default_reduction_cache_dir,
+)
+from sentence_dedup import deduplicate
+from sentence_encoder import DEFAULT_BATCH_SIZE
+from sentence_records import DEFAULT_CHUNK_SIZE, iter_chunks, iter_records, iter_sentences
+from umap_threads import seeded_global_rng, threaded_params
+from umap_model import (
+    DEFAULT_REFIT_DISTANCE_RATIO,
+    DEFAULT_REFIT_FRACTION,
+    check_drift,
+    load_umap_model,
+    model_path_for,
+    save_umap_model,
+    write_umap_model,
+)
+from warm_start import (
+    DEFAULT_WARM_START_EPOCHS,
+    WARM_START_LEARNING_RATE,
+    umap_default_epochs,
+    warm_start_init,
+)
+
+
+UMAP_PARAMS = {
+    "n_components": 3,
+    "n_neighbors": 15,
+    "min_dist": 0.1,
+    "metric": "cosine",
+    "random_state": 42,
+}
+
+
+def layout_params(args):
+    """What a saved UMAP model must have been fitted with to be reused"""
+    pre_reduce = [args.pre_reduce, args.pre_reduce_dim] if args.pre_reduce else None
+    return {
+        "embedding_model": DEFAULT_MODEL,
+        "pre_reduce": pre_reduce,
+        "landmarks": args.landmarks or None,
+        **UMAP_PARAMS,
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip())
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes used for keyword scanning (default: 1, serial)",
+    )
+    parser.add_argument(
+        "--sentences",
+        type=Path,
+        default=None,
+        help="Sentences file, a JSON array, line-delimited .jsonl or the columnar .npz store "
+             "(default: data/sentences_with_positions.json)",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=None,
+        help="Export file, JSON for the browser or the columnar .npz store for later stages "
+             "(default: 3DUMAP/data/umap_3d_data.json)",
+    )
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        default=DEFAULT_CHUNK_SIZE,
+        help=f"Sentence records scanned per chunk (default: {DEFAULT_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Re-score only what changed in keywords_precomputed.json since the last run, "
+             "reusing embeddings and UMAP coordinates when the filtered sentences stay the same",
+    )
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Place sentences that are not in the previous export with the saved UMAP "
+             "model, keeping existing points where they are; refits when drift is too large, "
+             "warm-started from the previous export (or --reference) and aligned onto it",
+    )
+    parser.add_argument(
+        "--refit-fraction",
+        type=float,
+        default=DEFAULT_REFIT_FRACTION,
+        help="--append refits once this fraction of the fitted set has been appended "
+             f"(default: {DEFAULT_REFIT_FRACTION})",
+    )
+    parser.add_argument(
+        "--refit-distance-ratio",
+        type=float,
+        default=DEFAULT_REFIT_DISTANCE_RATIO,
+        help="--append refits when new sentences are this many times further from their "
+             f"neighbors than fitted ones are (default: {DEFAULT_REFIT_DISTANCE_RATIO})",
+    )
+    parser.add_argument(
+        "--encode-workers",
+        type=int,
+        default=1,
+        help="Processes used for sentence encoding (default: 1, in this process)",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=DEFAULT_BATCH_SIZE,
+        help=f"Sentences per encoding batch (default: {DEFAULT_BATCH_SIZE})",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default="float32",
+        help="Precision embeddings are held at before UMAP: float32 (default), "
+             "float16, or per-dimension scaled int8",
+    )
+    parser.add_argument(
+        "--precision-report",
+        action="store_true",
+        help="Print memory use and kNN overlap with float32 for each precision",
+    )
+    parser.add_argument(
+        "--pre-reduce",
+        choices=METHODS,
+        default=None,
+        help="Reduce embeddings before UMAP with randomized PCA or a sparse random "
+             "projection (default: off, UMAP gets the full embeddings)",
+    )
+    parser.add_argument(
+        "--pre-reduce-dim",
+        type=int,
+        default=DEFAULT_DIMENSION,
+        help=f"Dimensions kept by --pre-reduce (default: {DEFAULT_DIMENSION})",
+    )
+    parser.add_argument(
+        "--umap-threads",
+        type=int,
+        default=1,
+        help="Threads for the UMAP layout optimization, -1 for all cores (default: 1, the "
+             "seeded single-threaded path, the only reproducible one). Parallel layouts vary "
+             "slightly between runs and are aligned onto the reference layout",
+    )
+    parser.add_argument(
+        "--reference",
+        type=Path,
+        default=None,
+        help="Layout --warm-start and --append refits start from and are aligned onto, as are "
+             "--umap-threads fits, in the umap_3d_data.json format or the .npz store "
+             "(default: the previous export)",
+    )
+    parser.add_argument(
+        "--warm-start",
+        action="store_true",
+        help="Start UMAP fits from the previous export's layout (or --reference) instead of a "
+             "spectral initialization, so existing points stay close to where they were",
+    )
+    parser.add_argument(
+        "--warm-start-epochs",
+        type=int,
+        default=DEFAULT_WARM_START_EPOCHS,
+        help=f"Optimization epochs of a --warm-start fit (default: {DEFAULT_WARM_START_EPOCHS})",
+    )
+    parser.add_argument(
+        "--landmarks",
+        type=int,
+        default=0,
+        help="Fit UMAP on this many sentences sampled by group and dominant keyword, and "
+             "place the rest with the fitted model (default: 0, fit on all sentences)",
+    )
+    parser.add_argument(
+        "--transform-workers",
+        type=int,
+        default=1,
+        help="Processes placing the non-landmark sentences (default: 1, in this process)",
+    )
+    parser.add_argument(
+        "--transform-chunk-size",
+        type=int,
+        default=DEFAULT_TRANSFORM_CHUNK_SIZE,
+        help=f"Sentences placed per task with --landmarks (default: {DEFAULT_TRANSFORM_CHUNK_SIZE})",
+    )
+    parser.add_argument(
+        "--landmark-report",
+        action="store_true",
+        help="With --landmarks, also fit all sentences and compare runtime and layout quality",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=["none", "exact", "near"],
+        default="exact",
+        help="Embed and lay out each distinct sentence once: exact duplicates (default), "
+             "exact and near duplicates, or none",
+    )
+    parser.add_argument(
+        "--near-threshold",
+        type=float,
+        default=0.9,
+        help="Character 5-gram Jaccard similarity for --dedup near (default: 0.9)",
+    )
+    return parser.parse_args()
+
+
+def load_previous_run(corpus_counts_path, output_path, sentences_hash):
+    """
+    Corpus keyword counts and exported points of the last run, or None when
+    they are missing or were computed from a different sentences file.
+    """
+    if not corpus_counts_path.exists() or not output_path.exists():
+        return None
+    previous_counts = KeywordCounts.load(corpus_counts_path)
+    if previous_counts.source_hash != sentences_hash or "keyword_scores" not in previous_counts.metadata:
+        return None
+    previous_output = list(iter_records(output_path))
+    if len(previous_output) != int((previous_counts.totals() > 0).sum()):
+        return None
+    return previous_counts, previous_output
+
+
+def rescore_points(points, counts, affected, keyword_scores):
+    """Update keyword lists, scores and z of the affected exported points in place"""
+    keywords_list = counts.keyword_lists()
+    scores_list = counts.average_scores(keyword_scores)
+    for i in np.flatnonzero(affected):
+        points[i]["keyword"] = keywords_list[i]
+        points[i]["embedded_speculative"] = float(scores_list[i])
+        points[i]["z"] = float(scores_list[i]) * 5  # Same scaling as the full run
+
+
+def embed_unique(args, sentences, cache_dir):
     """
-    Find all keywords in the sentence, counting occurrences.
-    Returns list of found keywords (with duplicates if word appears multiple times) 
-    and their average score.
+    Embeddings of the distinct sentences (see --dedup), and the inverse map
+    from every sentence to its row of embeddings.
     """
-    sentence_lower = sentence.lower()
-    
-    # Sort by length (longest first) to handle multi-word phrases better
-    sorted_keywords = sorted(all_keywords_dict.keys(), key=len, reverse=True)
-    
-    found_keywords = []
-    score_sum = 0.0
-    already_processed = set()  # Track which keywords we've already counted
-    
-    for keyword in sorted_keywords:
-        if keyword in already_processed:
-            continue
-            
+    if args.dedup == "none":
+        representatives = np.arange(len(sentences))
+        inverse = representatives
+    else:
+        near_threshold = args.near_threshold if args.dedup == "near" else None
+        representatives, inverse = deduplicate(sentences, near_threshold)
+        print(f"\nUnique sentences: {len(representatives)} "
+              f"({len(sentences) - len(representatives)} duplicates)")
+    unique_sentences = [sentences[i] for i in representatives]
+
+    print("\nComputing embeddings (this may take a few minutes)...")
+    # Only sentences without a cached embedding are encoded; the model loads only if needed
+    embeddings = encode_sentences(
+        unique_sentences,
+        cache_dir,
+        batch_size=args.batch_size,
+        workers=args.encode_workers,
+        precision=args.precision,
+    )
+
+    print(f"Embeddings shape: {embeddings.shape} ({embeddings.precision}, "
+          f"{embeddings.nbytes / 2**20:.1f} MB)")
+    if args.precision_report:
+        print_precision_report(encode_sentences(unique_sentences, cache_dir), k=15)
+    return embeddings, inverse
+
+
+def compare_with_full_fit(embeddings, landmark_coords, landmark_seconds, groups, data_dir):
+    """Print runtime and quality of a landmark layout next to a full fit of the same embeddings"""
+    import umap
+
+    print("\nFitting all sentences for comparison...")
+    start = time.perf_counter()
+    knn = cached_knn(
+        embeddings,
+        UMAP_PARAMS["n_neighbors"],
+        UMAP_PARAMS["metric"],
+        default_knn_cache_dir(data_dir),
+        UMAP_PARAMS["random_state"],
+    )
+    knn_indices = knn[0].copy()  # UMAP edits the graph it is given
+    full_coords = umap.UMAP(**UMAP_PARAMS, precomputed_knn=knn).fit_transform(embeddings)
+    full_seconds = time.perf_counter() - start
+
+    reports = [
+        {"runtime_s": seconds, **layout_report(embeddings, knn_indices, coords, groups, UMAP_PARAMS["n_neighbors"])}
+        for coords, seconds in ((landmark_coords, landmark_seconds), (full_coords, full_seconds))
+    ]
+    print(f"\n  {'':20s}{'landmarks':>12s}{'full fit':>12s}")
+    for measure in ("runtime_s", "knn_preservation", "trustworthiness", "group_separation"):
+        values = [report[measure] for report in reports]
+        print(f"  {measure:20s}" + "".join(
+            f"{value:>12.3f}" if value is not None else f"{'-':>12s}" for value in values
+        ))
+
+
+def previous_layout(output_path, records):
+    """
+    x/y of each record in the previous export, matched by sentence and url
+    (NaN for records that are not in it), or None without a previous export.
+    """
+    if not output_path.exists():
+        return None
+    table = load_table(output_path)
+    positions = dict(zip(
+        zip(table.values("sentence"), table.values("url")),
+        zip(table.values("x"), table.values("y")),
+    ))
+    previous_xy = np.full((len(records), 2), np.nan)
+    for i, record in enumerate(records):
+        position = positions.get((record.get("sentence"), record.get("url")))
+        if position is not None:
+            previous_xy[i] = position
+    return previous_xy
+
+
+def fit_layout(args, sentences, strata, cache_dir, data_dir, model_path, reference_xy=None,
+               warm_start=False):
+    """
+    Fit 3D UMAP on all sentences, or on --landmarks of them and place the
+    rest, and save the model for --append runs. strata holds a (group,
+    dominant keyword) label per sentence for the landmark sample. With
+    reference_xy (see previous_layout) the result is aligned onto that
+    layout, and with warm_start the fit starts from it.
+    """
+    # The UMAP import is slow, so it is only paid when this step runs
+    import umap
+
+    embeddings, inverse = embed_unique(args, sentences, cache_dir)
+
+    # UMAP works in float32, so reduced embeddings are only expanded for this call
+    embeddings = embeddings.to_float32()
+    pre_reducer = None
+    if args.pre_reduce:
+        embeddings, pre_reducer = cached_reduction(
+            embeddings,
+            args.pre_reduce,
+            args.pre_reduce_dim,
+            default_reduction_cache_dir(data_dir),
+            UMAP_PARAMS["random_state"],
+        )
+
+    landmarks = None
+    if args.landmarks and args.landmarks < len(embeddings):
+        # One label per distinct sentence, taken from its first occurrence
+        unique_strata = [strata[i] for i in np.unique(inverse, return_index=True)[1]]
+        landmarks = stratified_sample(unique_strata, args.landmarks, UMAP_PARAMS["random_state"])
+        fit_embeddings = embeddings[landmarks]
+        print(f"Running 3D UMAP on {len(landmarks)} of {len(embeddings)} sentences "
+              f"(landmarks by group and dominant keyword)...")
+    else:
+        fit_embeddings = embeddings
+        print("Running 3D UMAP...")
+
+    unique_xy = None
+    if reference_xy is not None:
+        # x/y per distinct sentence, from any of its records in the reference layout
+        known = ~np.isnan(reference_xy).any(axis=1)
+        unique_xy = np.full((len(embeddings), 2), np.nan)
+        unique_xy[inverse[known]] = reference_xy[known]
+        if not known.any():
+            print("  No sentences of the reference layout left, nothing to align onto")
+            unique_xy = None
+
+    warm_start_params = {}
+    if warm_start and unique_xy is not None:
+        fit_xy = unique_xy if landmarks is None else unique_xy[landmarks]
+        init = warm_start_init(
+            fit_embeddings, fit_xy, UMAP_PARAMS["n_components"], UMAP_PARAMS["n_neighbors"],
+            UMAP_PARAMS["random_state"],
+        )
+        if init is not None:
+            full_epochs = umap_default_epochs(len(fit_embeddings))
+            warm_start_params = {
+                "init": init,
+                "n_epochs": args.warm_start_epochs,
+                "learning_rate": WARM_START_LEARNING_RATE,
+            }
+            print(f"  Warm start: {int((~np.isnan(fit_xy[:, 0])).sum())} of {len(fit_embeddings)} "
+                  f"sentences start from the previous layout, {args.warm_start_epochs} epochs "
+                  f"instead of {full_epochs} ({full_epochs - args.warm_start_epochs} saved)")
+
+    start = time.perf_counter()
+    # The neighbor graph only depends on the embeddings, metric and k: it is cached
+    # and shared with other layouts of the same sentences (2D, other min_dist)
+    knn = cached_knn(
+        fit_embeddings,
+        UMAP_PARAMS["n_neighbors"],
+        UMAP_PARAMS["metric"],
+        default_knn_cache_dir(data_dir),
+        UMAP_PARAMS["random_state"],
+    )
+    if args.umap_threads != 1:
+        print(f"  Optimizing layout on {args.umap_threads if args.umap_threads > 0 else 'all'} threads")
+    umap_3d = umap.UMAP(
+        **threaded_params(UMAP_PARAMS, args.umap_threads), precomputed_knn=knn, **warm_start_params
+    )
+    # Threaded fits take their randomness from the global RNG, seeded like the serial path
+    with seeded_global_rng(UMAP_PARAMS["random_state"]):
+        if landmarks is None:
+            coords = umap_3d.fit_transform(embeddings)
+        else:
+            coords = landmark_layout(
+                umap_3d, embeddings, landmarks, args.transform_chunk_size, args.transform_workers
+            )
+    seconds = time.perf_counter() - start
+    print(f"UMAP complete ({seconds:.1f}s)")
+
+    alignment = None
+    if unique_xy is not None:
+        # Into the reference layout's frame (UMAP's own orientation and scale are arbitrary,
+        # and it rescales a warm start's initial layout)
+        known = ~np.isnan(unique_xy[:, 0])
+        alignment = fit_alignment(coords, unique_xy, known)
+        coords = apply_alignment(alignment, coords)
+        moved = np.linalg.norm(coords[known, :2] - unique_xy[known], axis=1)
+        print(f"  Aligned onto the reference layout, sentences in it moved by "
+              f"{np.median(moved):.3f} (median)")
+
+    if landmarks is not None and args.landmark_report:
+        groups = [group for group, _ in unique_strata]
+        compare_with_full_fit(embeddings, coords, seconds, groups, data_dir)
+
+    save_umap_model(
+        model_path, umap_3d, fit_embeddings, layout_params(args), pre_reducer,
+        n_fitted=len(embeddings), alignment=alignment,
+    )
+    print(f"Saved UMAP model to {model_path}")
+    return coords[inverse]
+
+
+def append_points(args, filtered_sentences, previous_xy, model_path, cache_dir):
+    """
+    Coordinates for the filtered records when only new sentences need placing:
+    records already in the previous export (previous_xy, see previous_layout)
+    keep their x/y, new ones are put in place with the saved model's
+    transform(). Returns None when there is no usable previous run or drift
+    calls for a refit.
+    """
+    if previous_xy is None or not model_path.exists():
+        print("  No saved UMAP model, fitting from scratch")
+        return None
+
+    coords = np.zeros((len(filtered_sentences), 3), dtype=np.float64)
+    new_rows = np.flatnonzero(np.isnan(previous_xy[:, 0]))
+    coords[:, :2] = np.nan_to_num(previous_xy)
+    print(f"  Sentences already placed: {len(filtered_sentences) - len(new_rows)}, new: {len(new_rows)}")
+    if not len(new_rows):
+        return coords
+
+    state = load_umap_model(model_path, layout_params(args))
+    if state is None:
+        print("  Saved UMAP model was made with other settings, fitting from scratch")
+        return None
+
+    new_sentences = [filtered_sentences[i].get("sentence", "") for i in new_rows]
+    embeddings, inverse = embed_unique(args, new_sentences, cache_dir)
+    embeddings = embeddings.to_float32()
+    if state.get("pre_reducer") is not None:
+        # The model was fitted on pre-reduced embeddings, new ones are projected the same way
+        embeddings = apply_reduction(state["pre_reducer"], embeddings)
+
+    reason = check_drift(state, embeddings, args.refit_fraction, args.refit_distance_ratio)
+    if reason:
+        print(f"  Refitting: {reason}")
+        return None
+
+    # transform() places points in the model's own frame, moved like the fitted layout
+    placed = apply_alignment(state.get("alignment"), state["reducer"].transform(embeddings))
+    coords[new_rows] = placed[inverse]
+    state["n_appended"] += len(embeddings)
+    write_umap_model(model_path, state)
+    print(f"  Placed {len(new_rows)} new sentences, existing points unchanged")
+    return coords
+
+
+def main():
+    args = parse_args()
+
+    # ========================================================================
+    # STEP 1: Load sentences and keywords
+    # ========================================================================
+    # Get the parent directory of the scripts folder
+    script_dir = Path(__file__).parent
+    root_dir = script_dir.parent
+
+    # Sentence records are streamed in chunks, never loaded as a whole
+    sentences_path = args.sentences or root_dir / "data" / "sentences_with_positions.json"
+    print(f"Sentences: {sentences_path}")
+    output_path = args.output or root_dir / "3DUMAP" / "data" / "umap_3d_data.json"
+    # Counts over the whole corpus (not only exported points), for --incremental
+    corpus_counts_path = output_path.with_name(f"{output_path.stem}_corpus_counts.npz")
+
+    print("Loading keywords...")
+    vocabulary = load_vocabulary(root_dir / "3DUMAP" / "data" / "keywords_precomputed.json")
+
+    # ========================================================================
+    # STEP 2: Extract ALL keywords and contextual scores
+    # ========================================================================
+    print("Extracting all keywords...")
+
+    # keyword -> score, shared with the other pipeline scripts. Variants take the
+    # contextual score of their main keyword, or their section's default score.
+    all_keywords_dict = vocabulary.keyword_scores
+
+    print(f"Total keywords to search for: {len(all_keywords_dict)}")
+
+    # ========================================================================
+    # STEP 3: Find keywords in sentences and filter
+    # ========================================================================
+    print("Searching for keywords in sentences...")
+
+    sentences_hash = file_hash(sentences_path)
+    all_counts = None
+    filtered_sentences = None
+
+    if args.incremental:
+        previous = load_previous_run(corpus_counts_path, output_path, sentences_hash)
+        if previous is None:
+            print("  No reusable previous run for these sentences, scanning everything")
+        else:
+            previous_counts, previous_output = previous
+            added, removed, rescored = diff_keyword_scores(
+                previous_counts.metadata["keyword_scores"], all_keywords_dict
+            )
+            print(f"  Keywords added: {len(added)}, removed: {len(removed)}, rescored: {len(rescored)}")
+            if not (added or removed or rescored):
+                print(f"Done! {output_path} is up to date")
+                return
+
+            # Only sentences containing added keywords are rescanned
+            all_counts, affected = update_counts(
+                previous_counts, iter_sentences(sentences_path), vocabulary.matcher,
+                added, removed, rescored,
+            )
+            print(f"  Sentences affected: {int(affected.sum())}")
+
+            previous_rows = np.flatnonzero(previous_counts.totals() > 0)
+            rows = np.flatnonzero(all_counts.totals() > 0)
+            if np.array_equal(previous_rows, rows):
+                # Same filtered sentences: keep embeddings and UMAP coordinates
+                counts = all_counts.take(rows)
+                rescore_points(previous_output, counts, affected[rows], all_keywords_dict)
+
+                write_records(previous_output, output_path)
+                counts.save(counts_path_for(output_path), file_hash(output_path))
+                all_counts.save(
+                    corpus_counts_path, sentences_hash, {"keyword_scores": all_keywords_dict}
+                )
+
+                print(f"Updated {int(affected[rows].sum())} points in {output_path}")
+                print("Done! Embeddings and UMAP coordinates reused")
+                return
+
+            print("  Sentences with keywords changed, recomputing embeddings and UMAP")
+
+    if all_counts is None:
+        # All keywords compiled into one automaton so each sentence is scanned once,
+        # counted into a sparse sentences x keywords occurrence matrix, one chunk
+        # of records at a time. Only records with keywords are kept.
+        executor = None
+        if args.workers > 1:
+            print(f"  Scanning with {args.workers} worker processes")
+            # One pool for every chunk, so the matcher is sent to each worker once
+            executor = vocabulary.matcher.pool(args.workers)
+        chunk_counts = []
+        filtered_sentences = []
         try:
-            if ' ' in keyword:  # Multi-word phrase
-                # Count occurrences
-                count = sentence_lower.count(keyword)
-                if count > 0:
-                    already_processed.add(keyword)
-                    # Add keyword once for each occurrence
-                    for _ in range(count):
-                        found_keywords.append(keyword)
-                        score_sum += all_keywords_dict[keyword]
-            else:  # Single word
-                pattern = r'\b' + re.escape(keyword) + r'\b'
-                matches = re.findall(pattern, sentence_lower)
-                if matches:
-                    already_processed.add(keyword)
-                    # Add keyword once for each match
-                    for _ in matches:
-                        found_keywords.append(keyword)
-                        score_sum += all_keywords_dict[keyword]
-        except Exception as e:
-            pass
-    
-    # Calculate average score
-    avg_score = score_sum / len(found_keywords) if found_keywords else 0.0
-    
-    return found_keywords, avg_score
-
-# Find keywords in all sentences and filter
-filtered_sentences = []
-keywords_list = []
-scores_list = []
-
-for i, sentence_data in enumerate(sentences_data):
-    if i % 1000 == 0:
-        print(f"  Processed {i}/{len(sentences_data)} sentences")
-    
-    sentence = sentence_data.get("sentence", "")
-    found_keywords, avg_score = find_keywords_in_sentence(sentence)
-    
-    # ONLY include sentences with at least one keyword
-    if found_keywords:
-        filtered_sentences.append(sentence_data)
-        keywords_list.append(found_keywords)
-        scores_list.append(avg_score)
-
-print(f"\nFiltered results:")
-print(f"  Original sentences: {len(sentences_data)}")
-print(f"  Sentences with keywords: {len(filtered_sentences)}")
-print(f"  Percentage: {100*len(filtered_sentences)/len(sentences_data):.1f}%")
-
-if len(filtered_sentences) == 0:
-    print("ERROR: No sentences with keywords found!")
-    exit(1)
-
-# Create dataframe from filtered sentences
-df = pd.DataFrame(filtered_sentences)
-df["keywords_found"] = keywords_list
-df["embedded_speculative"] = scores_list
-
-print(f"\nKeyword score statistics:")
-print(f"  Mean: {df['embedded_speculative'].mean():.3f}")
-print(f"  Min: {df['embedded_speculative'].min():.3f}")
-print(f"  Max: {df['embedded_speculative'].max():.3f}")
-
-sentences = df["sentence"].tolist()
-
-# ============================================================================
-# STEP 4: Embed sentences using sentence transformer
-# ============================================================================
-print("\nComputing embeddings (this may take a few minutes)...")
-model = SentenceTransformer("all-MiniLM-L6-v2")
-embeddings = model.encode(sentences, show_progress_bar=True)
-
-print(f"Embeddings shape: {embeddings.shape}")
-
-# ============================================================================
-# STEP 5: Run 3D UMAP
-# ============================================================================
-print("Running 3D UMAP...")
-umap_3d = umap.UMAP(
-    n_components=3,
-    n_neighbors=15,
-    min_dist=0.1,
-    metric="cosine",
-    random_state=42
-)
+            for chunk in iter_chunks(iter_records(sentences_path), args.chunk_size):
+                chunk_count = KeywordCounts.from_matcher(
+                    vocabulary.matcher, [record.get("sentence", "") for record in chunk],
+                    workers=args.workers, executor=executor,
+                )
+                chunk_counts.append(chunk_count)
+                filtered_sentences.extend(
+                    record for record, keep in zip(chunk, chunk_count.totals() > 0) if keep
+                )
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        all_counts = KeywordCounts.concatenate(chunk_counts)
 
-coords = umap_3d.fit_transform(embeddings)
-
-df["x"] = coords[:, 0]
-df["y"] = coords[:, 1]
-# Map Z axis to the embedded_speculative scores (normalize to reasonable range)
-# Scores range from -1.0 (embedded) to +1.0 (speculative)
-df["z"] = df["embedded_speculative"] * 5  # Scale for visibility
-
-print(f"UMAP complete")
-print(f"  X range: [{df['x'].min():.2f}, {df['x'].max():.2f}]")
-print(f"  Y range: [{df['y'].min():.2f}, {df['y'].max():.2f}]")
-print(f"  Z range (embeddedness->speculation): [{df['z'].min():.2f}, {df['z'].max():.2f}]")
-
-# ============================================================================
-# STEP 6: Export for browser
-# ============================================================================
-print("Exporting data...")
-
-# Select and order columns for export
-export_cols = [
-    "sentence", "url", "keywords_found", "group", 
-    "x", "y", "z", "embedded_speculative"
-]
-
-output_data = df[export_cols].copy()
-# Rename keywords_found to keyword for output
-output_data.rename(columns={"keywords_found": "keyword"}, inplace=True)
-output_data = output_data.to_dict(orient="records")
-
-output_path = root_dir / "3DUMAP" / "data" / "umap_3d_data.json"
-output_path.parent.mkdir(parents=True, exist_ok=True)
-with open(output_path, "w", encoding="utf-8") as f:
-    json.dump(output_data, f, indent=2, ensure_ascii=False)
-
-print(f"Exported to {output_path}")
-print(f"Done! {len(output_data)} points with keywords ready for Three.js")
+    # ONLY include sentences with at least one keyword
+    has_keywords = all_counts.totals() > 0
+    counts = all_counts.take(has_keywords)
+    if filtered_sentences is None:
+        # Counts came from --incremental, read the records with keywords again
+        filtered_sentences = [
+            record for record, keep in zip(iter_records(sentences_path), has_keywords) if keep
+        ]
+    # Found keywords (with duplicates if a word appears multiple times) and their average score
+    keywords_list = counts.keyword_lists()
+    scores_list = counts.average_scores(all_keywords_dict)
+
+    print(f"\nFiltered results:")
+    print(f"  Original sentences: {all_counts.shape[0]}")
+    print(f"  Sentences with keywords: {len(filtered_sentences)}")
+    print(f"  Percentage: {100*len(filtered_sentences)/max(all_counts.shape[0], 1):.1f}%")
+
+    if len(filtered_sentences) == 0:
+        print("ERROR: No sentences with keywords found!")
+        sys.exit(1)
+
+    print(f"\nKeyword score statistics:")
+    print(f"  Mean: {scores_list.mean():.3f}")
+    print(f"  Min: {scores_list.min():.3f}")
+    print(f"  Max: {scores_list.max():.3f}")
+
+    sentences = [record.get("sentence", "") for record in filtered_sentences]
+    cache_dir = default_cache_dir(root_dir / "3DUMAP" / "data")
+    model_path = model_path_for(output_path)
+
+    # ========================================================================
+    # STEP 4: Embed sentences and run 3D UMAP
+    # ========================================================================
+    coords = None
+    previous_xy = None
+    if args.append:
+        print("\nPlacing new sentences into the saved layout...")
+        previous_xy = previous_layout(output_path, filtered_sentences)
+        coords = append_points(args, filtered_sentences, previous_xy, model_path, cache_dir)
+    if coords is None:
+        # An --append run that has to refit starts from the layout it replaces,
+        # so the points already placed stay close to where they were
+        warm_start = args.warm_start or args.append
+        reference_xy = None
+        if previous_xy is not None and args.reference is None:
+            reference_xy = previous_xy
+        elif warm_start or args.umap_threads != 1:
+            reference_xy = previous_layout(args.reference or output_path, filtered_sentences)
+        strata = None
+        if args.landmarks:
+            strata = list(zip((record.get("group") for record in filtered_sentences),
+                              counts.dominant_keywords()))
+        coords = fit_layout(
+            args, sentences, strata, cache_dir, root_dir / "3DUMAP" / "data", model_path,
+            reference_xy, warm_start,
+        )
+
+    # Map Z axis to the embedded_speculative scores (normalize to reasonable range)
+    # Scores range from -1.0 (embedded) to +1.0 (speculative)
+    z = scores_list * 5  # Scale for visibility
+
+    print(f"  X range: [{coords[:, 0].min():.2f}, {coords[:, 0].max():.2f}]")
+    print(f"  Y range: [{coords[:, 1].min():.2f}, {coords[:, 1].max():.2f}]")
+    print(f"  Z range (embeddedness->speculation): [{z.min():.2f}, {z.max():.2f}]")
+
+    # ========================================================================
+    # STEP 5: Export for browser
+    # ========================================================================
+    print("Exporting data...")
+
+    # One record per filtered sentence, fields in export order
+    output_data = [
+        {
+            "sentence": record.get("sentence"),
+            "url": record.get("url"),
+            "keyword": keywords_list[i],
+            "group": record.get("group"),
+            "x": float(coords[i, 0]),
+            "y": float(coords[i, 1]),
+            "z": float(z[i]),
+            "embedded_speculative": float(scores_list[i]),
+        }
+        for i, record in enumerate(filtered_sentences)
+    ]
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    write_records(output_data, output_path)
+
+    print(f"Exported to {output_path}")
+
+    # Keep the occurrence matrix for the exported points, keyed by the export's content hash
+    counts.save(counts_path_for(output_path), file_hash(output_path))
+    # Corpus-wide counts and the scores they were made with, for --incremental runs
+    all_counts.save(corpus_counts_path, sentences_hash, {"keyword_scores": all_keywords_dict})
+    print(f"Saved keyword counts to {counts_path_for(output_path)}")
+    print(f"Done! {len(output_data)} points with keywords ready for Three.js")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Persistent sentence embedding cache.
+
+Embeddings are stored per model under a cache directory as .npy shards, each
+with a parallel array of sentence keys, plus an index.json listing the shards:
+
+    <cache_dir>/<model>/index.json
+    <cache_dir>/<model>/shard_<hash>.npy        float32 (rows x dim)
+    <cache_dir>/<model>/shard_<hash>_keys.npy   uint8 sentence keys (rows x 16)
+
+A sentence key is a hash of the normalized sentence (Unicode NFC, whitespace
+collapsed), so the same sentence from any script or run maps to the same row.
+Shards are opened memory-mapped, and only sentences missing from the cache
+are encoded; the model is not loaded at all when everything is cached.
+"""
+
+import hashlib
+import json
+import os
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+
+from embedding_precision import reduce_precision
+from sentence_encoder import DEFAULT_BATCH_SIZE, encode, encoding_pool, load_model
+
+DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+# Bump when the key or shard layout changes, to start from an empty cache
+CACHE_VERSION = 1
+
+# Bytes of the SHA-256 digest kept per sentence key
+KEY_BYTES = 16
+
+# Sentences encoded (and written as one shard) at a time
+ENCODE_CHUNK_SIZE = 20000
+
+
+def normalize_sentence(sentence):
+    """Text the cache key is computed from"""
+    return " ".join(unicodedata.normalize("NFC", sentence).split())
+
+
+def sentence_key(sentence):
+    """Content address of a sentence (bytes, KEY_BYTES long)"""
+    return hashlib.sha256(normalize_sentence(sentence).encode("utf-8")).digest()[:KEY_BYTES]
+
+
+def default_cache_dir(data_dir):
+    """Embedding cache directory used by the pipeline scripts for a data directory"""
+    return Path(data_dir) / ".cache" / "embeddings"
+
+
+def _split_keys(keys):
+    """Sentence keys from a (rows x KEY_BYTES) uint8 array"""
+    data = keys.tobytes()
+    return [data[i:i + KEY_BYTES] for i in range(0, len(data), KEY_BYTES)]
+
+
+def _atomic_save(path, array):
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        np.save(f, array)
+    os.replace(tmp_path, path)
+
+
+class EmbeddingCache:
+    """On-disk sentence -> embedding store for one model"""
+
+    def __init__(self, cache_dir, model_name=DEFAULT_MODEL):
+        self.model_name = model_name
+        # Model names like "sentence-transformers/all-MiniLM-L6-v2" become one directory
+        self.path = Path(cache_dir) / model_name.replace("/", "__")
+        self.index_path = self.path / "index.json"
+        self.dim = None
+        self._shards = []  # memory-mapped embedding arrays
+        self._shard_names = []
+        self._rows = {}  # sentence key -> (shard number, row)
+        self._load_index()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, sentence):
+        return sentence_key(sentence) in self._rows
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return  # No cache yet (or unreadable), start empty
+
+        if index.get("version") != CACHE_VERSION or index.get("model") != self.model_name:
+            return
+
+        for shard_name in index.get("shards", []):
+            try:
+                embeddings = np.load(self.path / f"{shard_name}.npy", mmap_mode="r")
+                keys = np.load(self.path / f"{shard_name}_keys.npy")
+            except (OSError, ValueError):
+                continue  # Missing or truncated shard, its sentences get re-encoded
+            if keys.shape != (len(embeddings), KEY_BYTES):
+                continue
+            shard_number = len(self._shards)
+            self._shards.append(embeddings)
+            self._shard_names.append(shard_name)
+            self.dim = embeddings.shape[1]
+            for row, key in enumerate(_split_keys(keys)):
+                self._rows[key] = (shard_number, row)
+
+    def missing(self, sentences):
+        """Indices of the sentences that have no cached embedding"""
+        return [i for i, sentence in enumerate(sentences) if sentence_key(sentence) not in self._rows]
+
+    def get(self, sentences, dtype=np.float32):
+        """Cached embeddings for the sentences, in order (every sentence must be cached)"""
+        embeddings = np.empty((len(sentences), self.dim or 0), dtype=dtype)
+        for i, sentence in enumerate(sentences):
+            shard_number, row = self._rows[sentence_key(sentence)]
+            embeddings[i] = self._shards[shard_number][row]
+        return embeddings
+
+    def add(self, sentences, embeddings):
+        """
+        Add embeddings for sentences as a new shard and update the index.
+        Returns False when the shard could not be written; the embeddings are
+        then only kept in memory for this cache object.
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if self.dim is not None and len(embeddings) and embeddings.shape[1] != self.dim:
+            raise ValueError(
+                f"Embedding size {embeddings.shape[1]} does not match the cache ({self.dim})"
+            )
+
+        keys = []
+        rows = []
+        for i, sentence in enumerate(sentences):
+            key = sentence_key(sentence)
+            if key not in self._rows:
+                self._rows[key] = (len(self._shards), len(keys))
+                keys.append(key)
+                rows.append(i)
+        if not keys:
+            return True
+
+        keys = np.frombuffer(b"".join(keys), dtype=np.uint8).reshape(-1, KEY_BYTES)
+        shard_name = f"shard_{hashlib.sha256(keys.tobytes()).hexdigest()[:16]}"
+        self._shards.append(embeddings[rows])
+        self.dim = embeddings.shape[1]
+
+        try:
+            self.path.mkdir(parents=True, exist_ok=True)
+            # Shard files first, then the index, so the index never names a partial shard
+            _atomic_save(self.path / f"{shard_name}.npy", self._shards[-1])
+            _atomic_save(self.path / f"{shard_name}_keys.npy", keys)
+            self._shard_names.append(shard_name)
+
+            index = {
+                "version": CACHE_VERSION,
+                "model": self.model_name,
+                "dim": self.dim,
+                "shards": self._shard_names,
+            }
+            tmp_path = self.index_path.with_name(f"index.json.{os.getpid()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=2)
+            os.replace(tmp_path, self.index_path)
+            # Served from disk from now on, like the shards loaded from the index
+            self._shards[-1] = np.load(self.path / f"{shard_name}.npy", mmap_mode="r")
+        except OSError:
+            return False  # Caching is best effort (e.g. read-only data directory)
+        return True
+
+
+def encode_sentences(sentences, cache_dir, model_name=DEFAULT_MODEL, show_progress_bar=True,
+                     batch_size=DEFAULT_BATCH_SIZE, workers=1, precision=None):
+    """
+    Embeddings for a list of sentences (float32, one row per sentence, in order).
+    Cached sentences are read from cache_dir; the rest are encoded with
+    SentenceTransformer(model_name), which is only loaded if something is missing,
+    and added to the cache. Repeated sentences are encoded once.
+    batch_size is passed to sentence_encoder.encode; with workers > 1 one
+    pool of that many processes (each loading the model once) encodes every
+    chunk of the run.
+    With a precision ("float32", "float16" or "int8") the result is a
+    ReducedEmbeddings at that precision, built without a float32 copy.
+    """
+    cache = EmbeddingCache(cache_dir, model_name)
+    missing = cache.missing(sentences)
+    print(f"  Cached embeddings: {len(sentences) - len(missing)} / {len(sentences)}")
+
+    if missing:
+        unique_missing = {}
+        for i in missing:
+            unique_missing.setdefault(sentence_key(sentences[i]), sentences[i])
+        to_encode = list(unique_missing.values())
+        print(f"  Encoding {len(to_encode)} new sentences with {model_name}")
+
+        # Encoded and stored a chunk at a time, so only one chunk of new
+        # embeddings is held in memory and an interrupted run keeps its progress
+        # The model (or the pool of workers holding it) is loaded once for all chunks
+        workers = max(1, min(workers, len(to_encode) // batch_size + 1))
+        model = load_model(model_name) if workers == 1 else None
+        executor = encoding_pool(model_name, workers) if workers > 1 else None
+        try:
+            for start in range(0, len(to_encode), ENCODE_CHUNK_SIZE):
+                chunk = to_encode[start:start + ENCODE_CHUNK_SIZE]
+                new_embeddings = encode(
+                    chunk, model_name, batch_size=batch_size, model=model, executor=executor,
+                    show_progress_bar=show_progress_bar,
+                )
+                if not cache.add(chunk, new_embeddings):
+                    print(f"  Could not write to {cache.path}, embeddings not cached")
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    if precision is None:
+        return cache.get(sentences)
+    if precision == "float32":
+        return reduce_precision(cache.get(sentences), precision)
+    # float16 holds every value int8 quantization needs at half the size of float32
+    return reduce_precision(cache.get(sentences, np.float16), precision)
@@ -0,0 +1,124 @@
+"""
+Reduced-precision sentence embeddings.
+
+Embeddings can be held as:
+  - float32: as produced by the model (4 bytes per value)
+  - float16: half precision (2 bytes per value)
+  - int8:    per-dimension scaled, value = offset + scale * (q + 128) (1 byte per value)
+
+knn_overlap() measures how much of each sentence's cosine neighborhood
+survives the reduction, which is what UMAP's layout is built from, and
+print_precision_report() prints it for every precision.
+"""
+
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+
+# Rows converted at a time, so no full-size float32 temporary is made
+CHUNK_ROWS = 65536
+
+
+class ReducedEmbeddings:
+    """Embedding matrix stored at a given precision"""
+
+    def __init__(self, values, precision, scale=None, offset=None):
+        self.values = values
+        self.precision = precision
+        self.scale = scale
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    @property
+    def nbytes(self):
+        extra = 0 if self.scale is None else self.scale.nbytes + self.offset.nbytes
+        return self.values.nbytes + extra
+
+    def to_float32(self):
+        """Embeddings as float32 (no copy when already float32)"""
+        if self.precision == "float32":
+            return self.values
+        embeddings = np.empty(self.values.shape, dtype=np.float32)
+        for start in range(0, len(self.values), CHUNK_ROWS):
+            chunk = self.values[start:start + CHUNK_ROWS].astype(np.float32)
+            if self.precision == "int8":
+                chunk = (chunk + 128) * self.scale + self.offset
+            embeddings[start:start + CHUNK_ROWS] = chunk
+        return embeddings
+
+
+def reduce_precision(embeddings, precision):
+    """Convert an embedding matrix to ReducedEmbeddings at the given precision"""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown precision {precision!r}, expected one of {PRECISIONS}")
+    if precision == "float32":
+        return ReducedEmbeddings(np.asarray(embeddings, dtype=np.float32), precision)
+    if precision == "float16":
+        return ReducedEmbeddings(np.asarray(embeddings, dtype=np.float16), precision)
+
+    # int8: each dimension's [min, max] is spread over the 256 levels
+    offset = embeddings.min(axis=0).astype(np.float32)
+    scale = (embeddings.max(axis=0).astype(np.float32) - offset) / 255
+    scale[scale == 0] = 1.0  # Constant dimension, every value maps to offset
+    values = np.empty(embeddings.shape, dtype=np.int8)
+    for start in range(0, len(embeddings), CHUNK_ROWS):
+        chunk = (embeddings[start:start + CHUNK_ROWS].astype(np.float32) - offset) / scale
+        values[start:start + CHUNK_ROWS] = np.clip(np.rint(chunk), 0, 255) - 128
+    return ReducedEmbeddings(values, precision, scale, offset)
+
+
+def _neighbors(embeddings, queries, k):
+    """Indices of the k nearest cosine neighbors of the query rows, excluding themselves"""
+    from sklearn.neighbors import NearestNeighbors
+
+    index = NearestNeighbors(n_neighbors=k + 1, metric="cosine", algorithm="brute")
+    index.fit(embeddings)
+    found = index.kneighbors(embeddings[queries], return_distance=False)
+    neighbors = np.empty((len(queries), k), dtype=found.dtype)
+    for row, (query, candidates) in enumerate(zip(queries, found)):
+        candidates = candidates[candidates != query]
+        neighbors[row] = candidates[:k]
+    return neighbors
+
+
+def knn_overlap(reference, candidate, k=15, sample=2000, seed=42):
+    """
+    Mean fraction of each row's k nearest cosine neighbors in reference
+    (float32) that are also among its k nearest neighbors in candidate.
+    At most sample rows are used as queries (all rows are searched).
+    """
+    n_rows = len(reference)
+    k = min(k, n_rows - 1)
+    if k < 1:
+        return 1.0
+    queries = np.arange(n_rows)
+    if n_rows > sample:
+        queries = np.sort(np.random.default_rng(seed).choice(n_rows, sample, replace=False))
+
+    reference_neighbors = _neighbors(reference, queries, k)
+    candidate_neighbors = _neighbors(candidate, queries, k)
+    shared = [
+        len(np.intersect1d(a, b, assume_unique=True))
+        for a, b in zip(reference_neighbors, candidate_neighbors)
+    ]
+    return float(np.mean(shared)) / k
+
+
+def print_precision_report(embeddings, k=15, sample=2000):
+    """Memory and kNN overlap with float32 for every precision"""
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    print(f"\nEmbedding precision report ({len(embeddings)} x {embeddings.shape[1]}, k={k}):")
+    for precision in PRECISIONS:
+        reduced = reduce_precision(embeddings, precision)
+        if precision == "float32":
+            overlap = 1.0
+        else:
+            overlap = knn_overlap(embeddings, reduced.to_float32(), k, sample)
+        print(f"  {precision:8s} {reduced.nbytes / 2**20:8.1f} MB "
+              f"({embeddings.nbytes / reduced.nbytes:.1f}x smaller)  kNN overlap: {overlap:.3f}")
@@ -0,0 +1,163 @@
+"""
+Export umap_3d_data as a packed binary point cloud for index.html.
+
+The JSON export repeats every point's url, keyword list and RGB triple and
+has to be parsed as a whole before the first frame. The bundle is one binary
+file the browser maps into typed arrays, plus a small JSON manifest:
+  - xyz               float32, 3 per point
+  - score             float32 embedded_speculative per point
+  - color             uint8 index into the manifest's palette (uint16 beyond 256 colors)
+  - url, group        uint32 ids into the string table
+  - keyword_offsets   uint32, point i's keywords are keyword_ids[offsets[i]:offsets[i + 1]]
+  - keyword_ids       uint32 ids into the string table
+  - text_offsets      uint32, point i's sentence is text[offsets[i]:offsets[i + 1]] (UTF-8)
+  - text              uint8
+  - string_offsets    uint32, string j is strings[offsets[j]:offsets[j + 1]] (UTF-8)
+  - strings           uint8
+Sections are little-endian and start at multiples of 4 bytes, so each is a
+typed array view on the downloaded buffer without copying.
+
+Run from 3d-landscape/ after the export (either format, see columnar_records):
+    python scripts/export_point_bundle.py
+    python scripts/export_point_bundle.py --input 3DUMAP/data/umap_3d_data.npz --output-dir 3DUMAP/data
+"""
+
+import argparse
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from columnar_records import load_table
+
+BUNDLE_VERSION = 1
+SECTION_ALIGNMENT = 4
+
+
+def encode_texts(texts):
+    """(offsets, bytes) of UTF-8 texts laid end to end"""
+    encoded = [text.encode("utf-8") for text in texts]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(data) for data in encoded])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+def build_sections(table):
+    """(sections in file order, palette, keyword kind) for the points of a RecordTable"""
+    n_points = len(table)
+    fields = set(table.fields)
+
+    def column(field, default):
+        if field not in fields:
+            return [default] * n_points
+        return [default if value is None else value for value in table.values(field)]
+
+    xyz = np.column_stack([column("x", 0.0), column("y", 0.0), column("z", 0.0)]).astype("<f4")
+    scores = np.array(column("embedded_speculative", 0.0), dtype="<f4")
+
+    # One palette entry per distinct color, null for points without one
+    palette_index = {}
+    colors = [palette_index.setdefault(tuple(color) if color else None, len(palette_index))
+              for color in column("color", None)]
+    palette = [list(color) if color else None for color in palette_index]
+    color_dtype = "<u1" if len(palette) <= 256 else "<u2"
+
+    # urls, groups and keywords share one string table
+    string_index = {}
+
+    def string_ids(values):
+        return np.fromiter((string_index.setdefault(value, len(string_index)) for value in values),
+                           dtype="<u4", count=len(values))
+
+    keywords = column("keyword", [])
+    # compute_3d_umap.py exports one keyword string per point, the filtered pipeline a list
+    keyword_kind = "string" if keywords and all(isinstance(value, str) for value in keywords) else "list"
+    keyword_lists = [[value] if isinstance(value, str) else value for value in keywords]
+    keyword_offsets = np.zeros(n_points + 1, dtype="<u4")
+    keyword_offsets[1:] = np.cumsum([len(values) for values in keyword_lists])
+
+    sections = [
+        ("xyz", xyz.ravel()),
+        ("score", scores),
+        ("color", np.array(colors, dtype=color_dtype)),
+        ("url", string_ids(column("url", ""))),
+        ("group", string_ids(column("group", ""))),
+        ("keyword_offsets", keyword_offsets),
+        ("keyword_ids", string_ids([value for values in keyword_lists for value in values])),
+    ]
+    sections += zip(("text_offsets", "text"), encode_texts(column("sentence", "")))
+    sections += zip(("string_offsets", "strings"), encode_texts(list(string_index)))
+    return sections, palette, keyword_kind
+
+
+def write_bundle(table, output_dir, name="umap_3d_data"):
+    """Write <name>.bin and <name>.manifest.json, returns (bundle path, manifest path)"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    bundle_path = output_dir / f"{name}.bin"
+    manifest_path = output_dir / f"{name}.manifest.json"
+
+    sections, palette, keyword_kind = build_sections(table)
+    manifest = {
+        "version": BUNDLE_VERSION,
+        "count": len(table),
+        "bundle": bundle_path.name,
+        "keyword_kind": keyword_kind,
+        "palette": palette,
+        "sections": {},
+    }
+
+    tmp_path = bundle_path.with_name(f"{bundle_path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        offset = 0
+        for section, array in sections:
+            padding = -offset % SECTION_ALIGNMENT
+            f.write(b"\0" * padding)
+            offset += padding
+            manifest["sections"][section] = {
+                "type": array.dtype.name,
+                "offset": offset,
+                "length": int(array.size),
+            }
+            f.write(array.tobytes())
+            offset += array.nbytes
+    manifest["byte_length"] = offset
+
+    # The manifest goes last, so a browser never sees it before its bundle
+    os.replace(tmp_path, bundle_path)
+    tmp_manifest = manifest_path.with_name(f"{manifest_path.name}.{os.getpid()}.tmp")
+    with open(tmp_manifest, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, separators=(",", ":"))
+    os.replace(tmp_manifest, manifest_path)
+    return bundle_path, manifest_path
+
+
+def parse_args():
+    script_dir = Path(__file__).parent
+    data_dir = script_dir.parent / "data"
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", type=Path, default=data_dir / "umap_3d_data.json",
+                        help="Points, JSON or the .npz store (default: data/umap_3d_data.json)")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Default: the input's directory")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    print(f"Loading {args.input}...")
+    table = load_table(args.input)
+    bundle_path, manifest_path = write_bundle(table, args.output_dir or args.input.parent)
+
+    bundle_kb = bundle_path.stat().st_size / 1024
+    manifest_kb = manifest_path.stat().st_size / 1024
+    print(f"✓ Exported {len(table)} points to {bundle_path} ({bundle_kb:.1f} KB)")
+    print(f"  Manifest: {manifest_path} ({manifest_kb:.1f} KB)")
+    if args.input.suffix == ".json":
+        print(f"  JSON: {args.input.stat().st_size / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
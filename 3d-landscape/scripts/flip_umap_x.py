@@ -1,8 +1,11 @@
-import json
+from columnar_records import write_records
+from sentence_records import iter_records
+
+# Nodes from compute_umap_from_keywords.py, in the columnar store
+NODES_PATH = 'landscape/nodes_with_umap_keywords.npz'
 
 # Load the existing UMAP data
-with open('landscape/nodes_with_umap_keywords.json', 'r', encoding='utf-8') as f:
-    nodes = json.load(f)
+nodes = list(iter_records(NODES_PATH))
 
 # Flip X coordinates
 for node in nodes:
@@ -10,8 +13,7 @@ for node in nodes:
         node['umap_x'] = -node['umap_x']
 
 # Save back
-with open('landscape/nodes_with_umap_keywords.json', 'w', encoding='utf-8') as f:
-    json.dump(nodes, f, indent=2)
+write_records(nodes, NODES_PATH)
 
 print(f"✓ Flipped X-axis for {len(nodes)} nodes")
 print("✓ FUTURE is now on the right, PAST is now on the left")
@@ -1,8 +1,9 @@
 import json
 
+from keyword_vocabulary import load_vocabulary
+
 # Load keywords_precomputed.json
-with open('3DUMAP/data/keywords_precomputed.json', 'r', encoding='utf-8') as f:
-    kp = json.load(f)
+vocabulary = load_vocabulary('3DUMAP/data/keywords_precomputed.json')
 
 # Function to convert HSL to RGB
 def hsl_to_rgb(h, s, l):
@@ -50,28 +51,8 @@ def generate_color(keyword):
     
     return hsl_to_rgb(hue, saturation, lightness)
 
-# Collect all keywords from keywords_precomputed.json
-all_keywords = set()
-
-# From contextual_scores
-contextual = kp.get('contextual_scores', {})
-for section in contextual.values():
-    all_keywords.update(section.keys())
-
-# From embedded_keywords
-for kw_list in kp.get('embedded_keywords', {}).values():
-    if isinstance(kw_list, list):
-        all_keywords.update(kw_list)
-
-# From speculative_keywords
-for kw_list in kp.get('speculative_keywords', {}).values():
-    if isinstance(kw_list, list):
-        all_keywords.update(kw_list)
-
-# From critique_keywords
-for kw_list in kp.get('critique_keywords', {}).values():
-    if isinstance(kw_list, list):
-        all_keywords.update(kw_list)
+# All keywords from keywords_precomputed.json (contextual scores and every variant)
+all_keywords = set(vocabulary.keyword_scores)
 
 # Create RGB-only mapping for all keywords
 rgb_only = {}
@@ -0,0 +1,347 @@
+"""
+Sparse sentence x keyword occurrence matrix.
+
+Keyword occurrences are counted once into a SciPy CSR matrix (one row per
+sentence, one column per keyword) and every statistic the pipeline needs is
+a vectorized operation on it: average scores, embedded/speculative ratios,
+dominant keyword per sentence and "keyword appears exactly k times" filters.
+
+Alongside the counts the matrix keeps, for every stored entry, the position
+at which that keyword first appeared in the sentence's keyword list. This
+gives the same tie-breaking as Counter(keyword_list).most_common(1).
+
+load_keyword_counts() caches the matrix for a umap_3d_data.json style file
+next to it, keyed by the file's content hash.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+
+class KeywordCounts:
+    """Occurrence counts of keywords (columns) in sentences (rows)"""
+
+    def __init__(self, matrix, keywords, first_seen, source_hash="", metadata=None):
+        self.matrix = matrix.tocsr()
+        self.keywords = list(keywords)
+        # Aligned with matrix.data: order of first appearance within the row
+        self.first_seen = np.asarray(first_seen, dtype=np.int32)
+        # What the counts were computed from (set by load())
+        self.source_hash = source_hash
+        self.metadata = metadata or {}
+        self._columns = {kw: i for i, kw in enumerate(self.keywords)}
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+    @classmethod
+    def _from_rows(cls, rows, keywords):
+        """Build from per-row lists of (column, count) in first-appearance order"""
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        indptr[1:] = np.cumsum([len(row) for row in rows])
+        indices = np.fromiter((col for row in rows for col, _ in row), dtype=np.int32, count=indptr[-1])
+        data = np.fromiter((count for row in rows for _, count in row), dtype=np.int32, count=indptr[-1])
+        first_seen = np.fromiter(
+            (pos for row in rows for pos in range(len(row))), dtype=np.int32, count=indptr[-1]
+        )
+        matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), len(keywords)))
+        return cls(matrix, keywords, first_seen)
+
+    @classmethod
+    def _from_matcher_matrix(cls, matrix, keywords):
+        """
+        Wrap a matrix whose columns are in matcher order. Keyword lists from the
+        matcher are grouped in column order, so first appearance = column order.
+        """
+        matrix = matrix.tocsr()
+        matrix.sum_duplicates()
+        matrix.sort_indices()
+        row_starts = np.repeat(matrix.indptr[:-1], np.diff(matrix.indptr))
+        first_seen = np.arange(matrix.nnz) - row_starts
+        return cls(matrix, keywords, first_seen)
+
+    @classmethod
+    def from_matcher(cls, matcher, sentences, workers=1, executor=None):
+        """
+        Count keywords in sentences with a KeywordMatcher (columns = matcher.keywords),
+        in a pool of workers processes or a running matcher.pool() passed as executor
+        """
+        counts_per_sentence = matcher.count_all(sentences, workers=workers, executor=executor)
+        rows = [sorted(counts.items()) for counts in counts_per_sentence]
+        return cls._from_rows(rows, matcher.keywords)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Stack counts of consecutive sentence chunks made with the same keywords"""
+        parts = list(parts)
+        if not parts:
+            raise ValueError("No counts to concatenate")
+        for part in parts[1:]:
+            if part.keywords != parts[0].keywords:
+                raise ValueError("Counts were made with different keywords")
+        matrix = sparse.vstack([part.matrix for part in parts], format="csr")
+        first_seen = np.concatenate([part.first_seen for part in parts])
+        return cls(matrix, parts[0].keywords, first_seen)
+
+    @classmethod
+    def from_lists(cls, keyword_lists):
+        """Count the keyword lists of already processed sentences (e.g. umap_3d_data.json)"""
+        columns = {}
+        rows = []
+        for keyword_list in keyword_lists:
+            row = {}
+            if isinstance(keyword_list, list):
+                for keyword in keyword_list:
+                    col = columns.setdefault(keyword, len(columns))
+                    row[col] = row.get(col, 0) + 1
+            rows.append(list(row.items()))
+        return cls._from_rows(rows, list(columns))
+
+    def save(self, path, source_hash="", metadata=None):
+        """Save to an .npz file, with the hash of its source and JSON-serializable metadata"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.npz")
+        np.savez_compressed(
+            tmp_path,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+            first_seen=self.first_seen,
+            keywords=np.array(self.keywords, dtype=str),
+            source_hash=np.array(source_hash),
+            metadata=np.array(json.dumps(metadata or {})),
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Load from an .npz file written by save()"""
+        with np.load(path) as npz:
+            matrix = sparse.csr_matrix(
+                (npz["data"], npz["indices"], npz["indptr"]), shape=tuple(npz["shape"])
+            )
+            metadata = json.loads(str(npz["metadata"])) if "metadata" in npz else {}
+            return cls(
+                matrix,
+                npz["keywords"].tolist(),
+                npz["first_seen"],
+                source_hash=str(npz["source_hash"]),
+                metadata=metadata,
+            )
+
+    def _row_ids(self):
+        return np.repeat(np.arange(self.shape[0]), np.diff(self.matrix.indptr))
+
+    def _columns_for(self, keywords, ignore_case=False):
+        if isinstance(keywords, str):
+            keywords = [keywords]
+        if ignore_case:
+            wanted = {kw.lower() for kw in keywords}
+            return [i for i, kw in enumerate(self.keywords) if kw.lower() in wanted]
+        return [self._columns[kw] for kw in keywords if kw in self._columns]
+
+    def totals(self):
+        """Number of keyword occurrences per sentence"""
+        return np.asarray(self.matrix.sum(axis=1)).ravel()
+
+    def occurrences(self, keywords, ignore_case=False):
+        """Occurrences per sentence of one keyword, or summed over a list of keywords"""
+        columns = self._columns_for(keywords, ignore_case)
+        if not columns:
+            return np.zeros(self.shape[0], dtype=np.int64)
+        return np.asarray(self.matrix[:, columns].sum(axis=1)).ravel()
+
+    def rows_with_count(self, keyword, count, ignore_case=False):
+        """Boolean mask of sentences where the keyword appears exactly `count` times"""
+        return self.occurrences(keyword, ignore_case) == count
+
+    def average_scores(self, keyword_scores, default=0.0):
+        """Mean score over all keyword occurrences per sentence (default when none)"""
+        scores = np.array([keyword_scores.get(kw, 0.0) for kw in self.keywords], dtype=np.float64)
+        totals = self.totals()
+        sums = self.matrix @ scores
+        averages = np.full(self.shape[0], default, dtype=np.float64)
+        np.divide(sums, totals, out=averages, where=totals > 0)
+        return averages
+
+    def ratio(self, numerator_keywords, denominator_keywords, default=0.5):
+        """
+        numerator / (numerator + denominator) occurrences per sentence, e.g. the
+        speculative share of embedded + speculative keywords; default when both are 0.
+        """
+        numerator = self.occurrences(numerator_keywords)
+        total = numerator + self.occurrences(denominator_keywords)
+        ratios = np.full(self.shape[0], default, dtype=np.float64)
+        np.divide(numerator, total, out=ratios, where=total > 0)
+        return ratios
+
+    def dominant_columns(self):
+        """
+        Column of the most frequent keyword per sentence (-1 for sentences without
+        keywords). Ties go to the keyword that appeared first, like Counter.most_common.
+        """
+        dominant = np.full(self.shape[0], -1, dtype=np.int64)
+        if self.matrix.nnz == 0:
+            return dominant
+        row_ids = self._row_ids()
+        order = np.lexsort((self.first_seen, -self.matrix.data, row_ids))
+        starts = self.matrix.indptr[:-1]
+        has_keywords = np.diff(self.matrix.indptr) > 0
+        dominant[has_keywords] = self.matrix.indices[order[starts[has_keywords]]]
+        return dominant
+
+    def dominant_keywords(self):
+        """Most frequent keyword per sentence (None for sentences without keywords)"""
+        return [self.keywords[col] if col >= 0 else None for col in self.dominant_columns()]
+
+    def keyword_lists(self):
+        """Rebuild the per-sentence keyword lists, grouped in first-appearance order"""
+        lists = []
+        indptr = self.matrix.indptr
+        indices = self.matrix.indices
+        data = self.matrix.data
+        for row in range(self.shape[0]):
+            start, end = indptr[row], indptr[row + 1]
+            entries = sorted(range(start, end), key=lambda i: self.first_seen[i])
+            lists.append([self.keywords[indices[i]] for i in entries for _ in range(data[i])])
+        return lists
+
+    def take(self, rows):
+        """Counts for a subset of sentences (boolean mask or index array)"""
+        rows = np.flatnonzero(rows) if np.asarray(rows).dtype == bool else np.asarray(rows)
+        # Carry first_seen through the row selection as a second matrix with the same layout
+        order = sparse.csr_matrix(
+            (self.first_seen + 1, self.matrix.indices, self.matrix.indptr), shape=self.shape
+        )
+        matrix = self.matrix[rows]
+        order = order[rows]
+        return KeywordCounts(matrix, self.keywords, order.data - 1)
+
+
+def diff_keyword_scores(old_scores, new_scores):
+    """Keywords added, removed and rescored between two keyword -> score dicts"""
+    added = [kw for kw in new_scores if kw not in old_scores]
+    removed = [kw for kw in old_scores if kw not in new_scores]
+    rescored = [kw for kw in new_scores if kw in old_scores and new_scores[kw] != old_scores[kw]]
+    return added, removed, rescored
+
+
+def update_counts(counts, sentences, matcher, added, removed, rescored):
+    """
+    Counts for a changed vocabulary from counts made with the previous one.
+
+    Each keyword is counted independently of the others, so only the columns of
+    added keywords need scanning, and only in sentences that contain one of them
+    as a substring. sentences can be any iterable (e.g. a stream), it is read
+    once. Returns (new counts with columns = matcher.keywords, boolean mask of
+    sentences whose keyword list or score may have changed).
+    """
+    n_rows = counts.shape[0]
+    new_columns = {kw: i for i, kw in enumerate(matcher.keywords)}
+
+    # Existing columns, moved to their position in the new matcher order
+    old = counts.matrix.tocoo()
+    col_map = np.array([new_columns.get(kw, -1) for kw in counts.keywords], dtype=np.int64)
+    if len(col_map):
+        kept = col_map[old.col] >= 0
+        rows, cols, data = [old.row[kept]], [col_map[old.col[kept]]], [old.data[kept]]
+    else:
+        rows, cols, data = [], [], []
+
+    # Added keywords: scan only the sentences that can contain them
+    affected = np.zeros(n_rows, dtype=bool)
+    if added:
+        candidates = []
+        candidate_sentences = []
+        for i, sentence in enumerate(sentences):
+            text = sentence.lower()
+            if any(kw in text for kw in added):
+                candidates.append(i)
+                candidate_sentences.append(sentence)
+        added_matcher = type(matcher)(
+            {kw: 0.0 for kw in added}, phrase_boundaries=matcher.phrase_boundaries
+        )
+        added_counts = KeywordCounts.from_matcher(added_matcher, candidate_sentences)
+        added_coo = added_counts.matrix.tocoo()
+        added_col_map = np.array([new_columns[kw] for kw in added_counts.keywords], dtype=np.int64)
+        candidates = np.array(candidates, dtype=np.int64)
+        rows.append(candidates[added_coo.row])
+        cols.append(added_col_map[added_coo.col])
+        data.append(added_coo.data)
+        affected[candidates[added_coo.row]] = True
+
+    matrix = sparse.coo_matrix(
+        (
+            np.concatenate(data) if data else np.zeros(0, dtype=np.int32),
+            (
+                np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64),
+                np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64),
+            ),
+        ),
+        shape=(n_rows, len(matcher.keywords)),
+    )
+    updated = KeywordCounts._from_matcher_matrix(matrix, matcher.keywords)
+
+    # Sentences containing removed or rescored keywords change too
+    changed = [kw for kw in removed + rescored if kw in counts._columns]
+    if changed:
+        affected |= counts.occurrences(changed) > 0
+
+    # If the search order of the surviving keywords moved, every keyword list may change
+    surviving = [kw for kw in counts.keywords if kw in new_columns]
+    if surviving != sorted(surviving, key=new_columns.get):
+        affected[:] = True
+
+    return updated, affected
+
+
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def counts_path_for(data_path):
+    """Where the counts for a data file are cached: <name>_counts.npz next to it"""
+    data_path = Path(data_path)
+    return data_path.with_name(f"{data_path.stem}_counts.npz")
+
+
+def load_keyword_counts(data_path, data=None):
+    """
+    Keyword counts for the points in a umap_3d_data.json style file.
+    Uses the cached matrix while the file is unchanged, otherwise counts the
+    'keyword' lists (from `data` if already loaded) and refreshes the cache.
+    """
+    data_path = Path(data_path)
+    source_hash = file_hash(data_path)
+    cache_path = counts_path_for(data_path)
+
+    if cache_path.exists():
+        try:
+            counts = KeywordCounts.load(cache_path)
+            if counts.source_hash == source_hash:
+                return counts
+        except (OSError, ValueError, KeyError):
+            pass  # Unreadable cache, rebuild below
+
+    if data is None:
+        with open(data_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    counts = KeywordCounts.from_lists([item.get("keyword", []) for item in data])
+    try:
+        counts.save(cache_path, source_hash)
+    except OSError:
+        pass  # Caching is best effort
+    return counts
@@ -0,0 +1,190 @@
+"""
+Single-pass keyword matcher for sentence scanning.
+
+Builds an Aho-Corasick automaton once from a keyword -> score dict and finds
+every keyword occurrence in a sentence with one walk over its characters,
+instead of sorting the keyword list and running one regex per keyword for
+every sentence.
+
+Matching rules are the same as the original find_keywords_in_sentence:
+  - multi-word keywords (containing a space) are plain substring matches,
+    counted like str.count
+  - single-word keywords must sit on regex word boundaries (\\b...\\b),
+    counted like re.findall
+  - found keywords are reported longest first (ties keep dict order), each
+    repeated once per occurrence
+
+find_all() scans a whole corpus, optionally sharded across a process pool.
+A pool from matcher.pool() can be passed to several find_all() / count_all()
+calls (e.g. one per chunk of a streamed corpus), so it starts, and the
+matcher is sent to its workers, only once.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+# Matcher of the current pool worker, set once per process by _init_worker
+_worker_matcher = None
+
+
+def _init_worker(matcher):
+    global _worker_matcher
+    _worker_matcher = matcher
+
+
+def _run_chunk(chunk):
+    method_name, sentences, kwargs = chunk
+    method = getattr(_worker_matcher, method_name)
+    return [method(sentence, **kwargs) for sentence in sentences]
+
+
+def _is_word_char(char):
+    """Same definition of a word character as the re module's \\w"""
+    return char.isalnum() or char == "_"
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton over a keyword -> score mapping"""
+
+    def __init__(self, keyword_scores, phrase_boundaries=False):
+        # Same order the original code searched in: longest first, stable on ties
+        self.keywords = sorted(keyword_scores.keys(), key=len, reverse=True)
+        self.scores = [keyword_scores[kw] for kw in self.keywords]
+        self.lengths = [len(kw) for kw in self.keywords]
+        self.phrase_boundaries = phrase_boundaries
+        # Phrases are substring matches unless phrase_boundaries is set, in which
+        # case every keyword is matched like \b<keyword>\b
+        self.is_phrase = [" " in kw and not phrase_boundaries for kw in self.keywords]
+        self.starts_with_word = [bool(kw) and _is_word_char(kw[0]) for kw in self.keywords]
+        self.ends_with_word = [bool(kw) and _is_word_char(kw[-1]) for kw in self.keywords]
+
+        # Trie: goto[state] maps a character to the next state
+        goto = [{}]
+        outputs = [[]]
+        for kw_id, keyword in enumerate(self.keywords):
+            if not keyword:
+                continue
+            state = 0
+            for char in keyword:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(kw_id)
+
+        # Failure links (breadth first), merging suffix outputs into each state
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        self._goto = goto
+        self._fail = fail
+        self._outputs = [tuple(out) for out in outputs]
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def count(self, sentence):
+        """
+        Count occurrences of every keyword in the sentence.
+        Returns a dict of keyword id -> occurrence count (ids index self.keywords).
+        """
+        text = sentence.lower()
+        goto = self._goto
+        fail = self._fail
+        outputs = self._outputs
+        lengths = self.lengths
+        is_phrase = self.is_phrase
+        starts_with_word = self.starts_with_word
+        ends_with_word = self.ends_with_word
+        text_len = len(text)
+
+        counts = {}
+        next_free = {}  # keyword id -> first position a new occurrence may start at
+        state = 0
+        for end, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not outputs[state]:
+                continue
+            for kw_id in outputs[state]:
+                start = end - lengths[kw_id] + 1
+                if start < next_free.get(kw_id, 0):
+                    continue  # overlaps the previous occurrence of the same keyword
+                if not is_phrase[kw_id]:
+                    before = start > 0 and _is_word_char(text[start - 1])
+                    after = end + 1 < text_len and _is_word_char(text[end + 1])
+                    if before == starts_with_word[kw_id] or after == ends_with_word[kw_id]:
+                        continue
+                counts[kw_id] = counts.get(kw_id, 0) + 1
+                next_free[kw_id] = end + 1
+        return counts
+
+    def find(self, sentence, repeat=True):
+        """
+        Find all keywords in the sentence and their average score.
+        With repeat=True a keyword is listed once per occurrence, otherwise once.
+        """
+        counts = self.count(sentence)
+        found_keywords = []
+        score_sum = 0.0
+        for kw_id in sorted(counts):
+            occurrences = counts[kw_id] if repeat else 1
+            for _ in range(occurrences):
+                found_keywords.append(self.keywords[kw_id])
+                score_sum += self.scores[kw_id]
+
+        avg_score = score_sum / len(found_keywords) if found_keywords else 0.0
+        return found_keywords, avg_score
+
+    def pool(self, workers):
+        """
+        Process pool of workers that each hold this matcher, for the executor
+        argument of find_all() / count_all(). Shut it down when done.
+        """
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,))
+
+    def find_all(self, sentences, workers=1, chunk_size=None, repeat=True, executor=None):
+        """
+        Run find() over a list of sentences, returning results in input order.
+        With workers > 1 the list is split into chunks scanned in a process pool;
+        the matcher is sent to each worker once, not with every chunk. A running
+        pool from pool() can be passed as executor instead (workers is then its size).
+        """
+        return self._map("find", sentences, workers, chunk_size, executor, repeat=repeat)
+
+    def count_all(self, sentences, workers=1, chunk_size=None, executor=None):
+        """Run count() over a list of sentences, in input order (see find_all)"""
+        return self._map("count", sentences, workers, chunk_size, executor)
+
+    def _map(self, method_name, sentences, workers, chunk_size, executor=None, **kwargs):
+        if workers <= 1 or len(sentences) < 2:
+            method = getattr(self, method_name)
+            return [method(sentence, **kwargs) for sentence in sentences]
+
+        if chunk_size is None:
+            # A few chunks per worker keeps the pool balanced without much overhead
+            chunk_size = max(1, min(5000, -(-len(sentences) // (workers * 4))))
+        chunks = [
+            (method_name, sentences[start:start + chunk_size], kwargs)
+            for start in range(0, len(sentences), chunk_size)
+        ]
+
+        results = []
+        # A pool passed in is left running for the caller's next call
+        with nullcontext(executor) if executor else self.pool(workers) as executor:
+            # map() yields chunk results in submission order
+            for chunk_results in executor.map(_run_chunk, chunks):
+                results.extend(chunk_results)
+        return results
@@ -0,0 +1,213 @@
+"""
+Shared keyword vocabulary built from keywords_precomputed.json.
+
+Builds every view of the keyword lists the pipeline scripts need in one pass:
+  - variant_to_main:  keyword variant -> main keyword (lemmatization)
+  - main_to_section:  main keyword -> "embedded" / "speculative" / "critique"
+  - keyword_scores:   searchable keyword -> embeddedness/speculation score
+  - keyword_colors:   keyword -> RGB from colorsnew.json (when a color file is given),
+                      with fuzzy name and category fallbacks (keywords_with_colors.json)
+  - point_colors:     keyword -> RGB of its main keyword, exact names only (the
+                      3D landscape point colors, see color())
+  - matcher:          compiled KeywordMatcher over keyword_scores
+
+load_vocabulary() caches the result next to the source file, keyed by the
+content hash of the source (and color) file, so later runs skip the rebuild.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+
+from keyword_matcher import KeywordMatcher
+
+# Bump when the structure or the rules below change, to invalidate old caches
+CACHE_VERSION = 2
+
+SECTIONS = {
+    "embedded_keywords": "embedded",
+    "speculative_keywords": "speculative",
+    "critique_keywords": "critique",
+}
+
+CONTEXTUAL_SECTIONS = {
+    "embeddedness_keywords": "embedded",
+    "speculative_keywords": "speculative",
+}
+
+# Score for variants whose main keyword has no contextual score
+DEFAULT_SCORES = {
+    "embedded": -0.5,
+    "speculative": 0.5,
+    "critique": 0.0,
+}
+
+
+class KeywordVocabulary:
+    """All lookups derived from keywords_precomputed.json"""
+
+    def __init__(self, variant_to_main, main_to_section, keyword_scores, keyword_colors, point_colors):
+        self.variant_to_main = variant_to_main
+        self.main_to_section = main_to_section
+        self.keyword_scores = keyword_scores
+        self.keyword_colors = keyword_colors
+        self.point_colors = point_colors
+        self.matcher = KeywordMatcher(keyword_scores)
+
+    @property
+    def keywords(self):
+        """All searchable keywords, in search order (longest first)"""
+        return self.matcher.keywords
+
+    def main_keyword(self, keyword):
+        """Main keyword for a variant, or the keyword itself if it is not a variant"""
+        return self.variant_to_main.get(keyword.lower(), keyword)
+
+    def color(self, keyword):
+        """
+        RGB color of a point whose most frequent keyword this is: the color
+        colorsnew.json gives its main keyword under that exact name, or None
+        """
+        return self.point_colors.get(keyword.lower())
+
+
+def _lookup_color(keyword, color_map):
+    """Find a color by exact name, then with spaces/hyphens/underscores swapped"""
+    kw_lower = keyword.lower()
+    candidates = [
+        keyword,
+        kw_lower,
+        kw_lower.replace(" ", "_").replace("-", "_"),
+        kw_lower.replace("_", "-"),
+        kw_lower.replace("_", " "),
+    ]
+    for candidate in candidates:
+        if candidate in color_map:
+            return color_map[candidate]
+    return None
+
+
+def build_vocabulary(keywords_precomputed, color_map=None):
+    """Build a KeywordVocabulary from the parsed keywords_precomputed.json"""
+    contextual_scores = keywords_precomputed.get("contextual_scores", {})
+
+    # Variants -> main keyword, main keyword -> section
+    variant_to_main = {}
+    main_to_section = {}
+    for section_name, section in SECTIONS.items():
+        for main_kw, variants in keywords_precomputed.get(section_name, {}).items():
+            if not isinstance(variants, list):
+                continue
+            main_to_section[main_kw] = section
+            for variant in variants:
+                variant_to_main[variant.lower()] = main_kw
+
+    for contextual_name, section in CONTEXTUAL_SECTIONS.items():
+        for main_kw in contextual_scores.get(contextual_name, {}):
+            main_to_section.setdefault(main_kw, section)
+
+    # Keyword -> score: explicit contextual scores first, then every variant
+    # takes its main keyword's contextual score or its section default
+    explicit_scores = {}
+    for contextual_name in CONTEXTUAL_SECTIONS:
+        for keyword, score in contextual_scores.get(contextual_name, {}).items():
+            explicit_scores.setdefault(keyword.lower(), score)
+
+    keyword_scores = {}
+    for contextual_name in CONTEXTUAL_SECTIONS:
+        for keyword, score in contextual_scores.get(contextual_name, {}).items():
+            keyword_scores[keyword.lower()] = score
+
+    for section_name, section in SECTIONS.items():
+        for main_kw, variants in keywords_precomputed.get(section_name, {}).items():
+            if not isinstance(variants, list):
+                continue
+            score = explicit_scores.get(main_kw.lower(), DEFAULT_SCORES[section])
+            for variant in variants:
+                keyword_scores.setdefault(variant.lower(), score)
+
+    # Keyword -> color. Keywords with their own contextual score are colored as
+    # themselves, other variants by their main keyword; data keywords that are
+    # in neither take the color of the first colored main keyword in their category.
+    keyword_colors = {}
+    point_colors = {}
+    if color_map:
+        color_keys = {}
+        for main_kw in main_to_section:
+            color_keys[main_kw.lower()] = main_kw
+        for variant, main_kw in variant_to_main.items():
+            color_keys[variant] = main_kw
+        for contextual_name in CONTEXTUAL_SECTIONS:
+            for main_kw in contextual_scores.get(contextual_name, {}):
+                color_keys[main_kw.lower()] = main_kw
+
+        for keyword, color_key in color_keys.items():
+            color = _lookup_color(color_key, color_map)
+            if color is not None:
+                keyword_colors[keyword] = color
+
+        for data_kw, category in keywords_precomputed.get("data_keyword_categories", {}).items():
+            data_kw_lower = data_kw.lower().strip()
+            if data_kw_lower in keyword_colors:
+                continue
+            for main_kw in keywords_precomputed.get(f"{category}_keywords", {}):
+                color = _lookup_color(main_kw, color_map)
+                if color is not None:
+                    keyword_colors[data_kw_lower] = color
+                    break
+
+        # Point colors only follow exact names, so points whose keyword has no
+        # color of its own keep the color they were exported with
+        point_keys = dict(variant_to_main)
+        for section in contextual_scores.values():
+            for main_kw in section:
+                point_keys[main_kw.lower()] = main_kw
+        point_colors = {
+            keyword: color_map[main_kw] for keyword, main_kw in point_keys.items() if main_kw in color_map
+        }
+
+    return KeywordVocabulary(variant_to_main, main_to_section, keyword_scores, keyword_colors, point_colors)
+
+
+def load_vocabulary(keywords_path, colors_path=None, cache_dir=None):
+    """
+    Load the vocabulary for a keywords_precomputed.json file (and optional colorsnew.json).
+    The built vocabulary is cached under cache_dir (default: .cache next to the
+    keywords file) and reused while both source files are unchanged.
+    """
+    keywords_path = Path(keywords_path)
+    keywords_bytes = keywords_path.read_bytes()
+    colors_bytes = Path(colors_path).read_bytes() if colors_path else b""
+
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}\0".encode())
+    digest.update(keywords_bytes)
+    digest.update(b"\0")
+    digest.update(colors_bytes)
+
+    cache_dir = Path(cache_dir) if cache_dir else keywords_path.parent / ".cache"
+    cache_path = cache_dir / f"keyword_vocabulary_{digest.hexdigest()[:16]}.pickle"
+
+    if cache_path.exists():
+        try:
+            with open(cache_path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+            pass  # Unreadable cache, rebuild below
+
+    keywords_precomputed = json.loads(keywords_bytes.decode("utf-8"))
+    color_map = json.loads(colors_bytes.decode("utf-8")) if colors_bytes else None
+    vocabulary = build_vocabulary(keywords_precomputed, color_map)
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump(vocabulary, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # Caching is best effort (e.g. read-only data directory)
+
+    return vocabulary
@@ -0,0 +1,131 @@
+"""
+Cached nearest-neighbor graphs for UMAP.
+
+The k-nearest-neighbor search is the part of a UMAP fit that only depends
+on the input data, the metric and k, not on n_components or min_dist. It is
+computed once per (content hash of the data, metric, k) and stored under a
+cache directory, so 2D and 3D layouts of the same data and every min_dist
+change reuse it:
+
+    <cache_dir>/knn_<data hash>_<metric>_k<k>.pickle
+
+Pass the result of cached_knn() as UMAP(precomputed_knn=...). A graph
+cached with a larger k is reused for smaller ones, cut down to the
+n_neighbors nearest (rows are sorted by distance).
+"""
+
+import hashlib
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+# Bump when the way graphs are computed changes, to ignore old cache files
+CACHE_VERSION = 1
+
+# UMAP computes exact neighbors below this many rows, and so do we
+EXACT_MAX_ROWS = 4096
+
+
+def default_knn_cache_dir(data_dir):
+    """kNN graph cache directory used by the pipeline scripts for a data directory"""
+    return Path(data_dir) / ".cache" / "knn"
+
+
+def data_hash(data):
+    """Content hash of a dense array or sparse matrix"""
+    digest = hashlib.sha256(f"v{CACHE_VERSION}\0".encode())
+    if sparse.issparse(data):
+        data = data.tocsr()
+        digest.update(f"csr{data.shape}".encode())
+        for part in (data.data, data.indices, data.indptr):
+            digest.update(np.ascontiguousarray(part).tobytes())
+    else:
+        data = np.ascontiguousarray(data)
+        digest.update(f"{data.dtype.str}{data.shape}".encode())
+        digest.update(data.tobytes())
+    return digest.hexdigest()
+
+
+def compute_knn(data, n_neighbors, metric, random_state=None):
+    """
+    (indices, distances, search index) of the n_neighbors nearest rows of
+    every row, itself included, like UMAP computes them. The NNDescent
+    search index is what UMAP.transform() queries for new points.
+    """
+    from pynndescent import NNDescent
+
+    n_neighbors = min(n_neighbors, data.shape[0])
+    search_index = NNDescent(
+        data, n_neighbors=n_neighbors, metric=metric, random_state=random_state, low_memory=True
+    )
+    if data.shape[0] < EXACT_MAX_ROWS:
+        # Small sets get exact neighbors, as in UMAP's own small-data path
+        from sklearn.neighbors import NearestNeighbors
+
+        exact = NearestNeighbors(n_neighbors=n_neighbors, metric=metric, algorithm="brute")
+        distances, indices = exact.fit(data).kneighbors(data)
+    else:
+        indices, distances = search_index.neighbor_graph
+    return indices.astype(np.int32), distances.astype(np.float32), search_index
+
+
+def _cached_files(cache_dir, digest, metric):
+    """Cached k -> path for a data hash and metric"""
+    files = {}
+    for path in Path(cache_dir).glob(f"knn_{digest[:16]}_{metric}_k*.pickle"):
+        try:
+            files[int(path.stem.rsplit("_k", 1)[1])] = path
+        except ValueError:
+            continue
+    return files
+
+
+def cached_knn(data, n_neighbors, metric, cache_dir, random_state=None):
+    """
+    kNN graph of data for UMAP(precomputed_knn=...), from cache_dir when one
+    with at least n_neighbors neighbors exists, computed and cached otherwise.
+    A larger cached graph is cut to its n_neighbors nearest columns, UMAP
+    builds its fuzzy graph on every column it is given. Returns fresh copies
+    of the arrays each call (UMAP edits them in place).
+    """
+    digest = data_hash(data)
+    metric = str(metric)
+
+    graph = None
+    cached = _cached_files(cache_dir, digest, metric)
+    for k in sorted(k for k in cached if k >= n_neighbors):
+        try:
+            with open(cached[k], "rb") as f:
+                graph = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            continue
+        if graph.get("digest") == digest:
+            print(f"  Reusing cached kNN graph (k={k}, {metric})")
+            break
+        graph = None
+
+    if graph is None:
+        print(f"  Computing kNN graph (k={n_neighbors}, {metric})...")
+        indices, distances, search_index = compute_knn(data, n_neighbors, metric, random_state)
+        graph = {
+            "digest": digest,
+            "indices": indices,
+            "distances": distances,
+            "search_index": search_index,
+        }
+        path = Path(cache_dir) / f"knn_{digest[:16]}_{metric}_k{n_neighbors}.pickle"
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(graph, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # Caching is best effort (e.g. read-only data directory)
+
+    indices = graph["indices"][:, :n_neighbors].copy()
+    distances = graph["distances"][:, :n_neighbors].copy()
+    return indices, distances, graph["search_index"]
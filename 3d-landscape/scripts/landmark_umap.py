@@ -0,0 +1,109 @@
+"""
+Landmark UMAP layouts for corpora too large to fit at once.
+
+UMAP is fitted on a stratified sample of the points (the landmarks), and
+every other point is placed into that layout with transform(), in chunks
+that can run in a process pool. Fit cost then grows with the sample size
+instead of the corpus, and transform() is linear in the remaining points.
+
+Strata are arbitrary hashable labels per point, e.g. (group, dominant
+keyword) pairs, so every group/keyword combination keeps its share of the
+sample and small ones are not left out.
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+
+DEFAULT_TRANSFORM_CHUNK_SIZE = 10000
+
+# Fitted reducer of the current pool worker, set by _init_worker
+_worker_reducer = None
+
+
+def stratified_sample(strata, n_samples, seed=42):
+    """
+    Sorted row indices of a sample of n_samples rows with each stratum
+    represented in proportion to its size (largest remainder rounding), and
+    at least once when there are no more strata than samples.
+    """
+    codes = {}
+    labels = np.fromiter((codes.setdefault(label, len(codes)) for label in strata), dtype=np.int64)
+    n_rows = len(labels)
+    if n_samples >= n_rows:
+        return np.arange(n_rows)
+
+    sizes = np.bincount(labels)
+    exact = sizes * (n_samples / n_rows)
+    quota = np.floor(exact).astype(np.int64)
+    if len(sizes) <= n_samples:
+        quota = np.maximum(quota, 1)
+    # Trim the largest quotas or top up by largest remainder to hit n_samples
+    while quota.sum() > n_samples:
+        quota[np.argmax(quota)] -= 1
+    for stratum in np.argsort(-(exact - quota), kind="stable"):
+        if quota.sum() >= n_samples:
+            break
+        if quota[stratum] < sizes[stratum]:
+            quota[stratum] += 1
+
+    rng = np.random.default_rng(seed)
+    order = np.argsort(labels, kind="stable")
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rows = [
+        rng.choice(order[start:start + size], count, replace=False)
+        for start, size, count in zip(starts, sizes, quota)
+        if count
+    ]
+    return np.sort(np.concatenate(rows))
+
+
+def _init_worker(reducer):
+    global _worker_reducer
+    _worker_reducer = reducer
+
+
+def _transform_chunk(chunk):
+    return _worker_reducer.transform(chunk)
+
+
+def transform_in_chunks(reducer, data, chunk_size=DEFAULT_TRANSFORM_CHUNK_SIZE, workers=1):
+    """reducer.transform(data) in chunks of chunk_size rows, over workers processes"""
+    chunks = [data[start:start + chunk_size] for start in range(0, len(data), chunk_size)]
+    if not chunks:
+        return np.empty((0, reducer.n_components), dtype=np.float32)
+    if workers > 1 and len(chunks) > 1:
+        # Spawned, not forked: numba's threading layer in this process is not fork-safe
+        with ProcessPoolExecutor(
+            max_workers=min(workers, len(chunks)),
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(reducer,),
+        ) as executor:
+            parts = list(executor.map(_transform_chunk, chunks))
+    else:
+        parts = [reducer.transform(chunk) for chunk in chunks]
+    return np.vstack(parts)
+
+
+def landmark_layout(reducer, data, landmarks, chunk_size=DEFAULT_TRANSFORM_CHUNK_SIZE, workers=1):
+    """
+    Layout of all rows of data: reducer is fitted on data[landmarks] (any
+    precomputed_knn it was built with must be for those rows), the other
+    rows are placed with transform_in_chunks().
+    """
+    start = time.perf_counter()
+    fitted = reducer.fit_transform(data[landmarks])
+    print(f"  Fitted {len(landmarks)} landmarks in {time.perf_counter() - start:.1f}s")
+
+    rest = np.ones(len(data), dtype=bool)
+    rest[landmarks] = False
+    coords = np.empty((len(data), fitted.shape[1]), dtype=fitted.dtype)
+    coords[landmarks] = fitted
+
+    start = time.perf_counter()
+    coords[rest] = transform_in_chunks(reducer, data[rest], chunk_size, workers)
+    print(f"  Placed {int(rest.sum())} other points in {time.perf_counter() - start:.1f}s")
+    return coords
@@ -0,0 +1,38 @@
+"""
+Similarity alignment of one 2D layout onto another.
+
+UMAP layouts are only defined up to rotation, reflection, scale and
+translation. fit_alignment() finds the transform that best maps a layout's
+x/y onto reference x/y for rows both have (orthogonal Procrustes with a
+uniform scale), so a new layout can be shown in the frame readers know.
+An alignment is a plain tuple and can be saved with a model, to place
+later points (e.g. from transform()) in the same frame.
+"""
+
+import numpy as np
+
+
+def fit_alignment(coords, reference, rows):
+    """
+    (source mean, linear map, target mean) moving coords[rows, :2] onto
+    reference[rows] with the least squared error
+    """
+    from scipy.linalg import orthogonal_procrustes
+
+    source = np.asarray(coords, dtype=np.float64)[rows, :2]
+    target = np.asarray(reference, dtype=np.float64)[rows, :2]
+    source_mean = source.mean(axis=0)
+    target_mean = target.mean(axis=0)
+    source = source - source_mean
+    rotation, singular_sum = orthogonal_procrustes(source, target - target_mean)
+    scale = singular_sum / max(float((source ** 2).sum()), 1e-12)
+    return source_mean, rotation * scale, target_mean
+
+
+def apply_alignment(alignment, coords):
+    """coords with x/y moved by alignment (None leaves them as they are)"""
+    coords = np.array(coords, dtype=np.float64)
+    if alignment is not None:
+        source_mean, linear, target_mean = alignment
+        coords[:, :2] = (coords[:, :2] - source_mean) @ linear + target_mean
+    return coords
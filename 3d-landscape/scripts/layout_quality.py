@@ -0,0 +1,74 @@
+"""
+Quality measures for a UMAP layout of sentence embeddings.
+
+  - knn_preservation: share of each point's k nearest neighbors in the
+    embedding space that are also among its k nearest neighbors in the layout
+  - trustworthiness:  sklearn's trustworthiness (penalizes layout neighbors
+    that were far apart in the embedding space), on a sample of points
+  - group_separation: silhouette score of the layout by group label
+    (-1..1, higher = groups form tighter, better separated clusters)
+"""
+
+import numpy as np
+
+DEFAULT_SAMPLE = 2000
+
+
+def _sample_rows(n_rows, sample, seed):
+    if n_rows <= sample:
+        return np.arange(n_rows)
+    return np.sort(np.random.default_rng(seed).choice(n_rows, sample, replace=False))
+
+
+def knn_preservation(knn_indices, coords, k=15):
+    """
+    Mean overlap of the high-dimensional neighbors in knn_indices (one row per
+    point, itself first, as in a UMAP kNN graph) with the layout's k nearest neighbors.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    k = min(k, knn_indices.shape[1] - 1, len(coords) - 1)
+    if k < 1:
+        return 1.0
+    layout_neighbors = NearestNeighbors(n_neighbors=k + 1).fit(coords).kneighbors(
+        coords, return_distance=False
+    )
+    shared = 0
+    for row, (high, low) in enumerate(zip(knn_indices, layout_neighbors)):
+        high = high[(high != row) & (high >= 0)][:k]
+        low = low[low != row][:k]
+        shared += len(np.intersect1d(high, low, assume_unique=True))
+    return shared / (k * len(coords))
+
+
+def trustworthiness(embeddings, coords, k=15, metric="cosine", sample=DEFAULT_SAMPLE, seed=42):
+    """sklearn trustworthiness on at most sample points"""
+    from sklearn.manifold import trustworthiness as sklearn_trustworthiness
+
+    rows = _sample_rows(len(coords), sample, seed)
+    k = min(k, len(rows) // 2 - 1)
+    if k < 1:
+        return 1.0
+    return float(sklearn_trustworthiness(embeddings[rows], coords[rows], n_neighbors=k, metric=metric))
+
+
+def group_separation(coords, groups, sample=DEFAULT_SAMPLE, seed=42):
+    """Silhouette score of the layout by group (None with fewer than two groups)"""
+    from sklearn.metrics import silhouette_score
+
+    groups = np.asarray([str(group) for group in groups])
+    if len(set(groups.tolist())) < 2:
+        return None
+    rows = _sample_rows(len(coords), sample, seed)
+    if len(set(groups[rows].tolist())) < 2:
+        return None
+    return float(silhouette_score(coords[rows], groups[rows]))
+
+
+def layout_report(embeddings, knn_indices, coords, groups, k=15):
+    """All measures for one layout, as a dict"""
+    return {
+        "knn_preservation": knn_preservation(knn_indices, coords, k),
+        "trustworthiness": trustworthiness(embeddings, coords, k),
+        "group_separation": group_separation(coords, groups),
+    }
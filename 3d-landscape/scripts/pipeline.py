@@ -0,0 +1,408 @@
+"""
+Build the 2D and 3D landscape data with one command, re-running only what changed.
+
+Every script of the build is a stage with explicit inputs, outputs and
+command-line arguments (STAGES below). 3D stages pass records in the
+columnar store (see columnar_records) and only the last one writes JSON.
+Stages may rewrite their file in place (data/nodes.json), so each stage's
+outputs are kept as content-addressed objects in .cache/pipeline/objects/:
+  - a stage's input is the output of the last stage declared before it that
+    writes the same path, or the file on disk when no stage does (a source)
+  - its fingerprint is a hash of its code (the script and the repo modules it
+    imports), its arguments and the content hashes of its inputs
+  - a stage whose fingerprint matches the last run is skipped and its
+    recorded outputs are reused; otherwise its inputs are written into place
+    from the store, the script runs and its outputs are stored
+  - stages that do not depend on each other run in parallel (--jobs)
+  - at the end, the last version of every output is written back
+A source file that the pipeline overwrote itself (nodes.json is both the raw
+input and the final output) keeps its original content as the source; replace
+the file to rebuild from new data.
+
+Run from the repository root:
+    python 3d-landscape/scripts/pipeline.py              # everything
+    python 3d-landscape/scripts/pipeline.py 2d           # one side, or stage names
+    python 3d-landscape/scripts/pipeline.py --dry-run    # what would run
+"""
+
+import argparse
+import ast
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from keyword_counts import file_hash
+
+SHARED_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SHARED_DIR.parents[1]
+DEFAULT_PIPELINE_DIR = REPO_ROOT / ".cache" / "pipeline"
+
+
+class Stage:
+    """A script run from cwd, reading inputs and writing outputs (paths relative to cwd)"""
+
+    def __init__(self, name, group, cwd, script, inputs, outputs, args=()):
+        self.name = name
+        self.group = group
+        self.cwd = REPO_ROOT / cwd
+        self.script = self.cwd / script
+        self.args = list(args)
+        # Repository-relative paths, the keys of everything the pipeline records
+        self.inputs = [self._key(path) for path in inputs]
+        self.outputs = [self._key(path) for path in outputs]
+        # Input path -> name of the stage producing it, None for sources (see resolve_stages)
+        self.sources = {}
+        # Of the current run: input path -> content hash, and the fingerprint
+        self.input_hashes = {}
+        self.fingerprint = None
+
+    def _key(self, path):
+        return (self.cwd / path).relative_to(REPO_ROOT).as_posix()
+
+    @property
+    def upstream(self):
+        return {name for name in self.sources.values() if name is not None}
+
+
+STAGES = [
+    # 2D landscape, from 2d-landscape/
+    Stage("umap-2d", "2d", "2d-landscape", "scripts/compute_umap_embeddings.py",
+          inputs=["data/nodes.json", "data/keywords_precomputed.json"],
+          outputs=["data/nodes.json"]),
+    Stage("landscape-data", "2d", "2d-landscape", "scripts/merge_landscape_files.py",
+          inputs=["data/landscape_metadata.json", "data/positions.json"],
+          outputs=["data/landscape_data.json"]),
+    # One pass for positions, offsets and rendering fields (add_positions_to_nodes.py,
+    # scale_positions.py, precompute_positions.py and optimize_nodes.py in turn)
+    Stage("build-nodes", "2d", "2d-landscape", "scripts/build_nodes.py",
+          inputs=["data/nodes.json"],
+          outputs=["data/nodes.json"]),
+    # 3D landscape, from 3d-landscape/
+    # Sentences in the columnar store (the JSON stays for 2d_other.html)
+    Stage("sentences-store", "3d", "3d-landscape", "scripts/columnar_records.py",
+          inputs=["data/sentences_with_positions.json"],
+          outputs=["data/sentences_with_positions.npz"],
+          args=["data/sentences_with_positions.json", "data/sentences_with_positions.npz"]),
+    Stage("umap-3d", "3d", "3d-landscape", "scripts/compute_3d_umap_filtered.py",
+          inputs=["data/sentences_with_positions.npz", "3DUMAP/data/keywords_precomputed.json"],
+          outputs=["3DUMAP/data/umap_3d_data.npz"],
+          args=["--sentences", "data/sentences_with_positions.npz", "--output", "3DUMAP/data/umap_3d_data.npz"]),
+    # Per-point fix-ups in one streaming pass, add transforms to --transforms.
+    # Writes the JSON the browser loads.
+    Stage("postprocess-3d", "3d", "3d-landscape", "scripts/postprocess_umap.py",
+          inputs=["3DUMAP/data/umap_3d_data.npz", "3DUMAP/data/keywords_precomputed.json",
+                  "3DUMAP/data/colorsnew.json"],
+          outputs=["3DUMAP/data/umap_3d_data.json"],
+          args=["--transforms", "colors", "--input", "3DUMAP/data/umap_3d_data.npz",
+                "--output", "3DUMAP/data/umap_3d_data.json"]),
+    # Packed binary point cloud index.html loads before the JSON
+    Stage("bundle-3d", "3d", "3d-landscape", "scripts/export_point_bundle.py",
+          inputs=["3DUMAP/data/umap_3d_data.json"],
+          outputs=["3DUMAP/data/umap_3d_data.bin", "3DUMAP/data/umap_3d_data.manifest.json"],
+          args=["--input", "3DUMAP/data/umap_3d_data.json"]),
+]
+
+
+def resolve_stages(stages):
+    """
+    Link every stage input to the last earlier stage writing that path.
+    Returns path -> name of the last stage writing it.
+    """
+    producer = {}
+    for stage in stages:
+        stage.sources = {path: producer.get(path) for path in stage.inputs}
+        for path in stage.outputs:
+            producer[path] = stage.name
+    return producer
+
+
+def select_stages(stages, targets):
+    """The stages named (or in the groups named) by targets, with everything upstream of them"""
+    if not targets:
+        return list(stages)
+    by_name = {stage.name: stage for stage in stages}
+    groups = {stage.group for stage in stages}
+    unknown = [target for target in targets if target not in by_name and target not in groups]
+    if unknown:
+        raise ValueError(f"Unknown stages: {', '.join(unknown)} "
+                         f"(stages: {', '.join(by_name)}; groups: {', '.join(sorted(groups))})")
+
+    selected = set()
+    todo = [stage.name for stage in stages if stage.name in targets or stage.group in targets]
+    while todo:
+        name = todo.pop()
+        if name not in selected:
+            selected.add(name)
+            todo.extend(by_name[name].upstream)
+    return [stage for stage in stages if stage.name in selected]
+
+
+def code_files(script):
+    """The script and the repository modules it imports, recursively"""
+    search_dirs = [script.parent, SHARED_DIR]
+    files = set()
+    todo = [script]
+    while todo:
+        path = todo.pop()
+        if path in files:
+            continue
+        files.add(path)
+        tree = ast.parse(path.read_text(encoding="utf-8"))
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                modules = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                modules = [node.module]
+            else:
+                continue
+            for module in modules:
+                for directory in search_dirs:
+                    candidate = directory / f"{module.split('.')[0]}.py"
+                    if candidate.exists():
+                        todo.append(candidate)
+                        break
+    return sorted(files)
+
+
+def stage_fingerprint(stage, input_hashes):
+    """Hash of a stage's code, arguments and input contents"""
+    payload = {
+        "code": {path.relative_to(REPO_ROOT).as_posix(): file_hash(path) for path in code_files(stage.script)},
+        "args": stage.args,
+        "inputs": input_hashes,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ArtifactStore:
+    """Content-addressed file copies and the record of previous runs"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.objects_dir = self.directory / "objects"
+        self.logs_dir = self.directory / "logs"
+        self.state_path = self.directory / "state.json"
+        # Directories are made on the first write, so a dry run leaves no trace
+        self.state = {"stages": {}, "sources": {}, "written": {}}
+        if self.state_path.exists():
+            try:
+                with open(self.state_path, "r", encoding="utf-8") as f:
+                    self.state.update(json.load(f))
+            except (OSError, ValueError):
+                pass  # Unreadable state, every stage runs again
+
+    def save_state(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.state_path.with_name(f"{self.state_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def has(self, digest):
+        return (self.objects_dir / digest).exists()
+
+    def put(self, path):
+        """Store a copy of a file, returns its content hash"""
+        digest = file_hash(path)
+        object_path = self.objects_dir / digest
+        if not object_path.exists():
+            self.objects_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = object_path.with_name(f"{digest}.{os.getpid()}.tmp")
+            shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, object_path)
+        return digest
+
+    def materialize(self, digest, key):
+        """Write the stored object digest to the repository path key, unless it is there already"""
+        path = REPO_ROOT / key
+        if path.exists() and file_hash(path) == digest:
+            return
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        shutil.copyfile(self.objects_dir / digest, tmp_path)
+        os.replace(tmp_path, path)
+        self.mark_written(key, digest)
+
+    def mark_written(self, key, digest):
+        written = self.state["written"].setdefault(key, [])
+        if digest not in written:
+            written.append(digest)
+
+    def source_hash(self, key, record=True):
+        """
+        Content hash of a source file. A file the pipeline wrote itself stands
+        for the source it was built from, which is read from the store instead.
+        With record=False (dry runs) a new source is hashed but not stored.
+        """
+        path = REPO_ROOT / key
+        current = file_hash(path) if path.exists() else None
+        known = self.state["sources"].get(key)
+        if known and self.has(known) and current in self.state["written"].get(key, []):
+            return known
+        if current is None:
+            raise FileNotFoundError(f"Missing input {key}")
+        if not record:
+            return current
+        self.put(path)
+        self.state["sources"][key] = current
+        return current
+
+
+def run_script(stage, log_path):
+    """(return code, seconds) of running a stage's script, output captured in log_path"""
+    start = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        process = subprocess.run(
+            [sys.executable, str(stage.script), *stage.args],
+            cwd=stage.cwd,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    return process.returncode, time.perf_counter() - start
+
+
+def conflicts(stage, running):
+    """True when stage would read or write a path a running stage writes or needs in another version"""
+    for other in running:
+        for path in set(stage.inputs + stage.outputs) & set(other.inputs + other.outputs):
+            if path in stage.outputs or path in other.outputs or stage.sources[path] != other.sources[path]:
+                return True
+    return False
+
+
+def run_pipeline(stages, store, jobs=1, force=False, dry_run=False):
+    """Run or skip every stage in dependency order, returns True when all succeeded"""
+    final_producer = {}
+    for stage in stages:
+        for path in stage.outputs:
+            final_producer[path] = stage.name
+
+    pending = list(stages)
+    outputs = {}  # stage name -> {path: content hash}, None when the stage would run (dry run)
+    running = {}  # future -> stage
+    failed = []
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if failed or len(running) >= jobs:
+                    break
+                if not stage.upstream <= outputs.keys() or conflicts(stage, running.values()):
+                    continue
+                pending.remove(stage)
+
+                stage.input_hashes = {
+                    path: outputs[source][path] if source else store.source_hash(path, not dry_run)
+                    for path, source in stage.sources.items()
+                }
+                stage.fingerprint = stage_fingerprint(stage, stage.input_hashes)
+                record = store.state["stages"].get(stage.name)
+                if (not force and record and record["fingerprint"] == stage.fingerprint
+                        and all(store.has(digest) for digest in record["outputs"].values())):
+                    print(f"  skip {stage.name} (unchanged)")
+                    outputs[stage.name] = record["outputs"]
+                    continue
+                if dry_run:
+                    print(f"  would run {stage.name}")
+                    outputs[stage.name] = {path: None for path in stage.outputs}
+                    continue
+
+                for path, digest in stage.input_hashes.items():
+                    store.materialize(digest, path)
+                print(f"  run {stage.name}...")
+                store.logs_dir.mkdir(parents=True, exist_ok=True)
+                future = pool.submit(run_script, stage, store.logs_dir / f"{stage.name}.log")
+                running[future] = stage
+
+            if not running:
+                if pending and not failed:
+                    raise RuntimeError(f"Cannot order stages: {', '.join(stage.name for stage in pending)}")
+                break
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                returncode, seconds = future.result()
+                missing = [path for path in stage.outputs if not (REPO_ROOT / path).exists()]
+                if returncode != 0 or missing:
+                    reason = f"exit code {returncode}" if returncode != 0 else f"did not write {', '.join(missing)}"
+                    print(f"  ✗ {stage.name} failed ({reason}), log: {store.logs_dir / f'{stage.name}.log'}")
+                    failed.append(stage.name)
+                    # Files rewritten in place go back to their input, not a half-written state
+                    for path in stage.outputs:
+                        if path in stage.input_hashes:
+                            store.materialize(stage.input_hashes[path], path)
+                    continue
+                stage_outputs = {}
+                for path in stage.outputs:
+                    stage_outputs[path] = store.put(REPO_ROOT / path)
+                    store.mark_written(path, stage_outputs[path])
+                store.state["stages"][stage.name] = {"fingerprint": stage.fingerprint, "outputs": stage_outputs}
+                store.save_state()
+                outputs[stage.name] = stage_outputs
+                print(f"  ✓ {stage.name} ({seconds:.1f}s)")
+
+    if dry_run:
+        return True
+    if failed:
+        store.save_state()
+        return False
+
+    # Last version of every output back in place
+    for path, name in final_producer.items():
+        store.materialize(outputs[name][path], path)
+        store.state["written"][path] = [outputs[name][path]]
+    store.save_state()
+    return True
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("targets", nargs="*", help="Stages or groups (2d, 3d) to build, with their upstream stages (default: all)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1, help="Stages run at the same time (default: all cores)")
+    parser.add_argument("--force", action="store_true", help="Run the selected stages even when unchanged")
+    parser.add_argument("--dry-run", action="store_true", help="Only show which stages would run")
+    parser.add_argument("--list", action="store_true", help="List the stages and exit")
+    parser.add_argument("--pipeline-dir", type=Path, default=DEFAULT_PIPELINE_DIR,
+                        help="Stored outputs, logs and run record (default: .cache/pipeline)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    resolve_stages(STAGES)
+
+    if args.list:
+        for stage in STAGES:
+            after = ", ".join(sorted(stage.upstream)) or "-"
+            print(f"{stage.name:22} {stage.group}  {stage.script.relative_to(REPO_ROOT)} (after: {after})")
+        return
+
+    try:
+        stages = select_stages(STAGES, args.targets)
+    except ValueError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+
+    print(f"Pipeline: {len(stages)} stages, {args.jobs} at a time")
+    store = ArtifactStore(args.pipeline_dir)
+    start = time.perf_counter()
+    try:
+        succeeded = run_pipeline(stages, store, args.jobs, args.force, args.dry_run)
+    except FileNotFoundError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    if not succeeded:
+        print("\n✗ Pipeline failed")
+        sys.exit(1)
+    print(f"\n✓ Pipeline done in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,190 @@
+"""
+Post-process umap_3d_data.json in one streaming pass.
+
+The fix-up steps that each loaded the whole file and rewrote it
+(add_colors_to_umap.py, lemmatize_keywords.py, update_neutral_keywords.py)
+are per-point transforms here, applied in the order given:
+    python scripts/postprocess_umap.py --transforms lemmatize,neutral-scores,colors
+
+Points are read one at a time (see sentence_records), passed through every
+transform and written to a temporary file that replaces the output at the
+end, so another transform costs no extra pass over the file. --input and
+--output are JSON or the columnar .npz store (see columnar_records).
+
+A transform is a class taking the parsed arguments, with __call__(point) ->
+point and summary() -> lines, registered in TRANSFORMS under its
+command-line name.
+
+Run from 3d-landscape/ (--list shows the transforms).
+"""
+
+import argparse
+import sys
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+
+from columnar_records import write_records
+from keyword_vocabulary import load_vocabulary
+from sentence_records import iter_records
+
+# Keywords whose sentences are neither embedded nor speculative: group -> keywords
+NEUTRAL_KEYWORDS = {
+    "making": ["make", "making", "made", "maker", "makers"],
+    "material": ["material", "materials", "materiality"],
+}
+NEUTRAL_SCORE = 0.0
+
+
+@lru_cache(maxsize=None)
+def shared_vocabulary(keywords_path, colors_path):
+    """One vocabulary for all transforms of a run"""
+    return load_vocabulary(keywords_path, colors_path)
+
+
+class LemmatizeTransform:
+    """Replace keyword variants with their main keyword (as lemmatize_keywords.py)"""
+
+    def __init__(self, args):
+        self.variant_to_main = shared_vocabulary(args.keywords, args.colors).variant_to_main
+        self.changes = Counter()
+
+    def __call__(self, point):
+        keywords = point.get("keyword")
+        if isinstance(keywords, list):
+            lemmatized = []
+            for keyword in keywords:
+                main_keyword = self.variant_to_main.get(keyword.lower())
+                if main_keyword is None:
+                    lemmatized.append(keyword)
+                else:
+                    lemmatized.append(main_keyword)
+                    self.changes[f"{keyword} → {main_keyword}"] += 1
+            point["keyword"] = lemmatized
+        return point
+
+    def summary(self):
+        lines = [f"Updated {sum(self.changes.values())} keyword instances"]
+        lines += [f"  {change}: {count} times" for change, count in self.changes.most_common(15)]
+        return lines
+
+
+class NeutralScoreTransform:
+    """Score NEUTRAL_SCORE for sentences with a NEUTRAL_KEYWORDS keyword (as update_neutral_keywords.py)"""
+
+    def __init__(self, args):
+        self.updated = 0
+        self.group_counts = Counter()
+
+    def __call__(self, point):
+        keywords = point.get("keyword", [])
+        groups = [group for group, group_keywords in NEUTRAL_KEYWORDS.items()
+                  if any(keyword in keywords for keyword in group_keywords)]
+        if groups:
+            point["embedded_speculative"] = NEUTRAL_SCORE
+            self.updated += 1
+            self.group_counts.update(groups)
+        return point
+
+    def summary(self):
+        lines = [f"Updated {self.updated} sentences"]
+        lines += [f"  - {self.group_counts[group]} with '{group}' keywords" for group in NEUTRAL_KEYWORDS]
+        return lines
+
+
+class ColorTransform:
+    """Color of the sentence's most frequent keyword (as add_colors_to_umap.py)"""
+
+    def __init__(self, args):
+        self.vocabulary = shared_vocabulary(args.keywords, args.colors)
+        self.found = 0
+        self.not_found = 0
+        self.colors_used = set()
+
+    def __call__(self, point):
+        keywords = point.get("keyword")
+        # Sentences without keywords have no most frequent keyword
+        if not isinstance(keywords, list) or not keywords:
+            return point
+        # Ties go to the keyword that appears first, as in KeywordCounts.dominant_keywords
+        most_freq = Counter(keywords).most_common(1)[0][0]
+        color = self.vocabulary.color(most_freq)
+        if color is not None:
+            point["color"] = color
+            self.found += 1
+            self.colors_used.add(self.vocabulary.main_keyword(most_freq))
+        else:
+            self.not_found += 1
+        return point
+
+    def summary(self):
+        return [
+            f"Color added: {self.found}",
+            f"Not found: {self.not_found}",
+            f"Main keywords used: {len(self.colors_used)}",
+        ]
+
+
+# Command-line name -> transform, in the default order
+TRANSFORMS = {
+    "lemmatize": LemmatizeTransform,
+    "neutral-scores": NeutralScoreTransform,
+    "colors": ColorTransform,
+}
+
+
+def parse_args():
+    script_dir = Path(__file__).parent
+    data_dir = script_dir.parent / "3DUMAP" / "data"
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--transforms",
+        default=",".join(TRANSFORMS),
+        help=f"Comma-separated transforms, applied in this order (default: {','.join(TRANSFORMS)})",
+    )
+    parser.add_argument("--input", type=Path, default=data_dir / "umap_3d_data.json")
+    parser.add_argument("--output", type=Path, default=None, help="Default: rewrite --input")
+    parser.add_argument("--keywords", type=Path, default=data_dir / "keywords_precomputed.json")
+    parser.add_argument("--colors", type=Path, default=data_dir / "colorsnew.json")
+    parser.add_argument("--list", action="store_true", help="List the transforms and exit")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.list:
+        for name, transform in TRANSFORMS.items():
+            print(f"{name:16} {transform.__doc__}")
+        return
+
+    names = [name.strip() for name in args.transforms.split(",") if name.strip()]
+    unknown = [name for name in names if name not in TRANSFORMS]
+    if unknown:
+        print(f"✗ Unknown transforms: {', '.join(unknown)} (available: {', '.join(TRANSFORMS)})")
+        sys.exit(1)
+    output_path = args.output or args.input
+
+    print(f"Transforms: {' → '.join(names)}")
+    transforms = [TRANSFORMS[name](args) for name in names]
+
+    def transformed_points():
+        for i, point in enumerate(iter_records(args.input)):
+            if i % 5000 == 0:
+                print(f"  Processing {i}...")
+            for transform in transforms:
+                point = transform(point)
+            yield point
+
+    count = write_records(transformed_points(), output_path)
+
+    print(f"\n✓ Post-processed {count} points into {output_path}")
+    for name, transform in zip(names, transforms):
+        print(f"\n{name}:")
+        for line in transform.summary():
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
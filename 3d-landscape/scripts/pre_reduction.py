@@ -0,0 +1,137 @@
+"""
+Optional reduction of embeddings to fewer dimensions before UMAP.
+
+UMAP's neighbor search and layout optimization get cheaper with the input
+dimension, and 384-d sentence embeddings or TF-IDF columns carry much less
+independent signal than that. Two methods:
+  - pca:               randomized PCA (truncated SVD for sparse input, which
+                       is not centered), keeps the directions of most variance
+  - random-projection: sparse random projection, no fitting, approximately
+                       preserves pairwise distances
+
+Reduced data is cached per (content hash of the input, method, dimension,
+seed) next to the embedding cache, together with the fitted reducer so new
+rows can be projected the same way:
+
+    <cache_dir>/reduced_<data hash>_<method>_d<dimension>.pickle
+"""
+
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+from scipy import sparse
+
+from knn_graph import data_hash
+
+METHODS = ("pca", "random-projection")
+
+DEFAULT_DIMENSION = 50
+
+
+def default_reduction_cache_dir(data_dir):
+    """Pre-reduction cache directory used by the pipeline scripts for a data directory"""
+    return Path(data_dir) / ".cache" / "reduced"
+
+
+def make_reducer(method, n_components, sparse_input=False, random_state=42):
+    """Unfitted sklearn transformer for a pre-reduction method"""
+    if method == "pca":
+        if sparse_input:
+            from sklearn.decomposition import TruncatedSVD
+
+            return TruncatedSVD(n_components=n_components, algorithm="randomized", random_state=random_state)
+        from sklearn.decomposition import PCA
+
+        return PCA(n_components=n_components, svd_solver="randomized", random_state=random_state)
+    if method == "random-projection":
+        from sklearn.random_projection import SparseRandomProjection
+
+        return SparseRandomProjection(n_components=n_components, dense_output=True, random_state=random_state)
+    raise ValueError(f"Unknown pre-reduction method: {method} (expected one of {', '.join(METHODS)})")
+
+
+def _total_variance(data):
+    """Sum of the column variances of a dense array or sparse matrix"""
+    if sparse.issparse(data):
+        mean = np.asarray(data.mean(axis=0)).ravel()
+        mean_square = np.asarray(data.multiply(data).mean(axis=0)).ravel()
+        return float((mean_square - mean ** 2).sum())
+    return float(np.asarray(data, dtype=np.float64).var(axis=0).sum())
+
+
+def variance_kept(reducer, data):
+    """
+    Share of the total variance of data that lies in the subspace the reducer
+    projects onto. For PCA this is its explained variance ratio; a random
+    projection is measured by projecting data orthogonally onto the span of
+    its random directions.
+    """
+    if hasattr(reducer, "explained_variance_ratio_"):
+        return float(reducer.explained_variance_ratio_.sum())
+
+    components = reducer.components_
+    components = components.toarray() if sparse.issparse(components) else np.asarray(components)
+    basis, _ = np.linalg.qr(components.T.astype(np.float64))
+    total = _total_variance(data)
+    if total == 0:
+        return 1.0
+    return _total_variance(np.asarray(data @ basis)) / total
+
+
+def reduce_dimensions(data, method, n_components, random_state=42):
+    """(reduced float32 array, fitted reducer, variance kept) of data"""
+    n_components = min(n_components, data.shape[1])
+    reducer = make_reducer(method, n_components, sparse.issparse(data), random_state)
+    reduced = reducer.fit_transform(data)
+    return np.ascontiguousarray(reduced, dtype=np.float32), reducer, variance_kept(reducer, data)
+
+
+def cached_reduction(data, method, n_components, cache_dir, random_state=42):
+    """
+    (reduced float32 array, fitted reducer) of data, from cache_dir when the
+    same data was reduced the same way before, computed and cached otherwise.
+    Prints the dimensions and the share of variance kept.
+    """
+    digest = data_hash(data)
+    path = Path(cache_dir) / f"reduced_{digest[:16]}_{method}_d{n_components}.pickle"
+
+    cached = None
+    try:
+        with open(path, "rb") as f:
+            cached = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        pass
+    if cached is not None and (cached.get("digest"), cached.get("random_state")) != (digest, random_state):
+        cached = None
+
+    if cached is not None:
+        print(f"  Reusing cached {method} reduction")
+    else:
+        print(f"  Reducing {data.shape[1]} dimensions to {n_components} ({method})...")
+        reduced, reducer, kept = reduce_dimensions(data, method, n_components, random_state)
+        cached = {
+            "digest": digest,
+            "random_state": random_state,
+            "reduced": reduced,
+            "reducer": reducer,
+            "variance_kept": kept,
+        }
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(cached, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # Caching is best effort (e.g. read-only data directory)
+
+    print(f"  Pre-reduced {data.shape[1]} -> {cached['reduced'].shape[1]} dimensions, "
+          f"{100 * cached['variance_kept']:.1f}% of the variance kept")
+    return cached["reduced"], cached["reducer"]
+
+
+def apply_reduction(reducer, data):
+    """Project new rows with a reducer returned by cached_reduction()"""
+    return np.ascontiguousarray(reducer.transform(data), dtype=np.float32)
@@ -0,0 +1,131 @@
+"""
+Duplicate sentence detection before encoding and UMAP.
+
+Crawled pages repeat boilerplate sentences, so the same text shows up many
+times in sentences_with_positions.json. deduplicate() groups them so the
+embedding and layout steps run once per distinct sentence:
+  - exact duplicates: same text after case folding and whitespace collapsing
+  - near duplicates (optional): MinHash over character 5-grams with LSH
+    banding, confirmed by the true Jaccard similarity of the 5-gram sets
+
+Results map every record to its representative (the first record of its
+group), so per-sentence results can be fanned back out with inverse.
+"""
+
+import zlib
+
+import numpy as np
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+SEED = 42
+
+
+def dedupe_key(sentence):
+    """Text two sentences must share to count as exact duplicates"""
+    return " ".join(sentence.casefold().split())
+
+
+def _shingles(text):
+    """Hashed character n-grams of a normalized sentence"""
+    if len(text) <= SHINGLE_SIZE:
+        return {zlib.crc32(text.encode("utf-8"))}
+    return {
+        zlib.crc32(text[i:i + SHINGLE_SIZE].encode("utf-8"))
+        for i in range(len(text) - SHINGLE_SIZE + 1)
+    }
+
+
+def _lsh_bands(threshold, num_perm):
+    """(bands, rows) splitting num_perm whose S-curve midpoint is closest to threshold"""
+    options = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(options, key=lambda band_rows: abs((1 / band_rows[0]) ** (1 / band_rows[1]) - threshold))
+
+
+def _minhash_signatures(shingle_sets, num_perm, seed):
+    """One row of num_perm min-hashes per shingle set (multiply-shift hashing)"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+    b = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for i, shingles in enumerate(shingle_sets):
+            x = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+            hashed = (x[:, None] * a + b) >> np.uint64(32)
+            signatures[i] = hashed.min(axis=0)
+    return signatures
+
+
+def _near_duplicate_parents(texts, threshold, num_perm=NUM_PERM, seed=SEED):
+    """
+    For each text, the index of the earliest text it is a near duplicate of
+    (itself when none). Candidates share an LSH band; a pair only counts
+    when the shingle Jaccard similarity reaches threshold.
+    """
+    shingle_sets = [_shingles(text) for text in texts]
+    signatures = _minhash_signatures(shingle_sets, num_perm, seed)
+    bands, rows = _lsh_bands(threshold, num_perm)
+
+    parent = list(range(len(texts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets = {}
+        band_bytes = np.ascontiguousarray(signatures[:, band * rows:(band + 1) * rows])
+        for i in range(len(texts)):
+            buckets.setdefault(band_bytes[i].tobytes(), []).append(i)
+
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            # Greedy clustering inside the bucket: each member is compared with
+            # the bucket's cluster leaders, not with every other member
+            leaders = []
+            for i in members:
+                for leader in leaders:
+                    if find(i) == find(leader):
+                        break
+                    union = len(shingle_sets[i] | shingle_sets[leader])
+                    if len(shingle_sets[i] & shingle_sets[leader]) >= threshold * union:
+                        root_i, root_leader = find(i), find(leader)
+                        parent[max(root_i, root_leader)] = min(root_i, root_leader)
+                        break
+                else:
+                    leaders.append(i)
+
+    return [find(i) for i in range(len(texts))]
+
+
+def deduplicate(sentences, near_threshold=None):
+    """
+    Group duplicate sentences.
+    Returns (representatives, inverse): representatives are the indices of
+    the first sentence of every group, in input order, and inverse maps each
+    sentence to its group's position in representatives, so that
+    per_group_results[inverse] gives one row per input sentence.
+    With near_threshold (0-1, shingle Jaccard similarity) near duplicates
+    are grouped too.
+    """
+    first_by_key = {}
+    exact_parent = np.empty(len(sentences), dtype=np.int64)
+    for i, sentence in enumerate(sentences):
+        exact_parent[i] = first_by_key.setdefault(dedupe_key(sentence), i)
+
+    parent = exact_parent
+    if near_threshold is not None and first_by_key:
+        unique_rows = np.array(list(first_by_key.values()), dtype=np.int64)
+        texts = list(first_by_key.keys())
+        near_parent = _near_duplicate_parents(texts, near_threshold)
+        # Position among unique texts -> input row of its near-duplicate parent
+        parent_row = unique_rows[near_parent]
+        row_position = np.empty(len(sentences), dtype=np.int64)
+        row_position[unique_rows] = np.arange(len(unique_rows))
+        parent = parent_row[row_position[exact_parent]]
+
+    representatives, inverse = np.unique(parent, return_inverse=True)
+    return representatives, inverse.reshape(-1)
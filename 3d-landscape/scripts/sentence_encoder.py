@@ -0,0 +1,154 @@
+"""
+CPU encoding engine for sentence embeddings.
+
+Sentences are sorted by token length and cut into batches, so each batch
+pads to about the same length instead of to the longest sentence in a
+random mix. Batches are encoded in one process, or spread over a pool of
+worker processes that each load the model once and are pinned to a fixed
+number of torch/BLAS threads, so workers do not oversubscribe the cores.
+Results are put back in input order. A pool from encoding_pool() can be
+passed to several encode() calls, so the workers load the model only once.
+
+Token lengths come from the model's tokenizer when the model is loaded in
+this process; pool mode estimates them from words and punctuation (what
+BERT-style tokenizers split on before WordPiece) to avoid loading the model
+in the parent process.
+"""
+
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import get_context
+
+import numpy as np
+
+DEFAULT_BATCH_SIZE = 32
+
+# Batches handed to a pool worker per task
+BATCHES_PER_TASK = 8
+
+_PRE_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+# Model of the current pool worker, loaded once per process by _init_worker
+_worker_model = None
+
+
+def _pin_threads(threads):
+    """Limit torch and the BLAS/OpenMP pools of this process to a number of threads"""
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[name] = str(threads)
+    import torch
+
+    torch.set_num_threads(threads)
+
+
+def load_model(model_name):
+    """SentenceTransformer on the CPU"""
+    from sentence_transformers import SentenceTransformer
+
+    return SentenceTransformer(model_name, device="cpu")
+
+
+def _init_worker(model_name, threads):
+    global _worker_model
+    _pin_threads(threads)
+    _worker_model = load_model(model_name)
+
+
+def _encode_task(task):
+    sentences, batch_size = task
+    return _worker_model.encode(sentences, batch_size=batch_size, show_progress_bar=False)
+
+
+def encoding_pool(model_name, workers, threads=None):
+    """
+    Pool of spawned processes that each load SentenceTransformer(model_name)
+    once, with threads torch threads each (default: the CPU count split
+    evenly between workers). Pass it as encode(executor=...) and shut it
+    down when done.
+    """
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    print(f"  Encoding with {workers} worker processes x {threads} threads")
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        # Spawned workers start without the parent's torch/OpenMP thread pools
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, threads),
+    )
+
+
+def estimate_token_lengths(sentences):
+    """Approximate token counts: words and punctuation marks"""
+    return np.array([len(_PRE_TOKEN_RE.findall(sentence)) for sentence in sentences])
+
+
+def token_lengths(sentences, tokenizer):
+    """Token counts from a Hugging Face tokenizer (without special tokens)"""
+    encoded = tokenizer(list(sentences), add_special_tokens=False)["input_ids"]
+    return np.array([len(ids) for ids in encoded])
+
+
+def length_sorted_batches(lengths, batch_size):
+    """Index batches of sentences sorted by length, longest first"""
+    order = np.argsort(-np.asarray(lengths), kind="stable")
+    return [order[start:start + batch_size] for start in range(0, len(order), batch_size)]
+
+
+def encode(sentences, model_name, batch_size=DEFAULT_BATCH_SIZE, workers=1, threads=None,
+           model=None, executor=None, show_progress_bar=True):
+    """
+    Encode sentences with SentenceTransformer(model_name), length-bucketed.
+    workers > 1 encodes in a pool of spawned processes started for this call
+    (see encoding_pool); a running pool can be passed as executor instead.
+    An already loaded model can be passed for serial encoding.
+    Returns float32 embeddings in input order and prints sentences/sec.
+    """
+    if not sentences:
+        return np.empty((0, 0), dtype=np.float32)
+
+    start_time = time.perf_counter()
+    workers = max(1, min(workers, len(sentences) // batch_size + 1))
+
+    if workers == 1 and executor is None:
+        if model is None:
+            if threads:
+                _pin_threads(threads)
+            model = load_model(model_name)
+        lengths = token_lengths(sentences, model.tokenizer)
+        batches = length_sorted_batches(lengths, batch_size)
+        progress = batches
+        if show_progress_bar:
+            from tqdm.auto import tqdm
+
+            progress = tqdm(batches, desc="Batches")
+        results = [
+            model.encode([sentences[i] for i in batch], batch_size=batch_size, show_progress_bar=False)
+            for batch in progress
+        ]
+    else:
+        batches = length_sorted_batches(estimate_token_lengths(sentences), batch_size)
+        # Longest batches go out first, so the pool does not end on one slow task
+        tasks = [
+            np.concatenate(batches[start:start + BATCHES_PER_TASK])
+            for start in range(0, len(batches), BATCHES_PER_TASK)
+        ]
+        # A pool passed in is left running for the caller's next call
+        pool = nullcontext(executor) if executor else encoding_pool(model_name, workers, threads)
+        with pool as executor:
+            results = list(executor.map(
+                _encode_task, [([sentences[i] for i in task], batch_size) for task in tasks]
+            ))
+        batches = tasks
+
+    order = np.concatenate(batches)
+    sorted_embeddings = np.concatenate([np.asarray(r, dtype=np.float32) for r in results])
+    embeddings = np.empty_like(sorted_embeddings)
+    embeddings[order] = sorted_embeddings
+
+    elapsed = time.perf_counter() - start_time
+    print(f"  Encoded {len(sentences)} sentences in {elapsed:.1f}s "
+          f"({len(sentences) / elapsed:.1f} sentences/sec)")
+    return embeddings
@@ -0,0 +1,98 @@
+"""
+Streaming reader for sentences_with_positions.json.
+
+iter_records() yields one sentence record at a time instead of loading the
+whole file:
+  - .jsonl / .ndjson files hold one JSON record per line
+  - .json files (a JSON array of records) are parsed incrementally with
+    ijson when it is installed, otherwise loaded with json.load
+  - .npz files are the columnar store (see columnar_records)
+
+iter_chunks() groups records into lists, so stages can work on a bounded
+number of records at a time.
+
+Convert an existing file to the line-delimited variant with:
+    python scripts/sentence_records.py data/sentences_with_positions.json
+"""
+
+import json
+import os
+import sys
+from itertools import islice
+from pathlib import Path
+
+DEFAULT_CHUNK_SIZE = 20000
+
+LINE_DELIMITED_SUFFIXES = (".jsonl", ".ndjson")
+
+
+def iter_records(path):
+    """Yield the records of a JSON array file, a line-delimited JSON file or the columnar store"""
+    path = Path(path)
+    if path.suffix == ".npz":
+        from columnar_records import RecordTable
+
+        yield from RecordTable.load(path).records()
+        return
+
+    if path.suffix in LINE_DELIMITED_SUFFIXES:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    try:
+        import ijson
+    except ImportError:
+        ijson = None
+
+    if ijson is None:
+        with open(path, "r", encoding="utf-8") as f:
+            yield from json.load(f)
+        return
+
+    with open(path, "rb") as f:
+        # use_float keeps numbers as float like json.load (ijson defaults to Decimal)
+        yield from ijson.items(f, "item", use_float=True)
+
+
+def iter_chunks(records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Group an iterable of records into lists of at most chunk_size records"""
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_sentences(path):
+    """Yield the sentence text of every record"""
+    for record in iter_records(path):
+        yield record.get("sentence", "")
+
+
+def write_line_delimited(records, path):
+    """Write records one JSON object per line"""
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False))
+            f.write("\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(f"Usage: python {sys.argv[0]} <input.json> [output.jsonl]")
+        sys.exit(1)
+
+    input_path = Path(sys.argv[1])
+    output_path = Path(sys.argv[2]) if len(sys.argv) == 3 else input_path.with_suffix(".jsonl")
+    count = write_line_delimited(iter_records(input_path), output_path)
+    print(f"Wrote {count} records to {output_path}")
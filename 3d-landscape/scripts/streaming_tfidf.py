@@ -0,0 +1,87 @@
+"""
+TF-IDF features of a stream of sentences, never as a dense matrix.
+
+TfidfVectorizer needs every sentence in memory to fit its vocabulary, and
+the pipeline used to call .toarray() on the result. Here the same features
+are built in two passes over chunks of sentences:
+
+    counter = TermCounter(ngram_range=(1, 2))
+    for chunk in chunks():                       # pass 1: term statistics
+        counter.update(chunk)
+    vocabulary, idf = counter.vocabulary(max_features=384, min_df=2, max_df=0.8)
+    matrix = sparse.vstack([tfidf_rows(chunk, vocabulary, idf, (1, 2))
+                            for chunk in chunks()])   # pass 2: sparse rows
+
+The vocabulary is selected and weighted like TfidfVectorizer's (document
+frequency limits, then the most frequent terms; smooth idf; L2-normalized
+rows), so the result equals TfidfVectorizer(...).fit_transform(sentences).
+Only term statistics and the sparse rows are held in memory.
+"""
+
+from collections import defaultdict
+from numbers import Integral
+
+import numpy as np
+from scipy import sparse
+
+
+class TermCounter:
+    """Term and document frequencies of all n-grams, accumulated chunk by chunk"""
+
+    def __init__(self, ngram_range=(1, 1)):
+        self.ngram_range = ngram_range
+        self.term_counts = defaultdict(int)
+        self.doc_counts = defaultdict(int)
+        self.n_docs = 0
+
+    def update(self, texts):
+        """Add the terms of a chunk of sentences"""
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        texts = list(texts)
+        self.n_docs += len(texts)
+        vectorizer = CountVectorizer(ngram_range=self.ngram_range)
+        try:
+            counts = vectorizer.fit_transform(texts)
+        except ValueError:
+            return  # No terms in this chunk
+        terms = vectorizer.get_feature_names_out()
+        term_counts = np.asarray(counts.sum(axis=0)).ravel()
+        doc_counts = np.bincount(counts.indices, minlength=len(terms))
+        for term, term_count, doc_count in zip(terms.tolist(), term_counts.tolist(), doc_counts.tolist()):
+            self.term_counts[term] += term_count
+            self.doc_counts[term] += doc_count
+
+    def vocabulary(self, max_features=None, min_df=1, max_df=1.0):
+        """
+        (term -> column, idf per column) of the terms TfidfVectorizer would
+        keep with these parameters, columns in sorted term order
+        """
+        terms = sorted(self.doc_counts)
+        doc_counts = np.array([self.doc_counts[term] for term in terms], dtype=np.int64)
+        term_counts = np.array([self.term_counts[term] for term in terms], dtype=np.int64)
+
+        max_doc_count = max_df if isinstance(max_df, Integral) else max_df * self.n_docs
+        min_doc_count = min_df if isinstance(min_df, Integral) else min_df * self.n_docs
+        keep = (doc_counts <= max_doc_count) & (doc_counts >= min_doc_count)
+        if max_features is not None and keep.sum() > max_features:
+            # Most frequent terms overall, as TfidfVectorizer picks them
+            top = (-term_counts[keep]).argsort()[:max_features]
+            limited = np.zeros(len(terms), dtype=bool)
+            limited[np.flatnonzero(keep)[top]] = True
+            keep = limited
+
+        kept = np.flatnonzero(keep)
+        vocabulary = {terms[i]: column for column, i in enumerate(kept)}
+        # Smooth idf, as TfidfTransformer computes it
+        idf = np.log((1 + self.n_docs) / (1 + doc_counts[kept])) + 1
+        return vocabulary, idf
+
+
+def tfidf_rows(texts, vocabulary, idf, ngram_range=(1, 1)):
+    """Sparse L2-normalized TF-IDF rows of a chunk of sentences"""
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.preprocessing import normalize
+
+    counts = CountVectorizer(vocabulary=vocabulary, ngram_range=ngram_range).transform(list(texts))
+    return normalize(counts @ sparse.diags(idf), norm="l2").tocsr()
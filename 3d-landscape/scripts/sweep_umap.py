@@ -0,0 +1,181 @@
+"""
+Sweep UMAP parameters over the sentences of umap_3d_data.json.
+
+Every combination of --n-neighbors, --min-dist and --n-components is laid
+out in a process pool from the cached sentence embeddings and one shared
+kNN graph (computed for the largest n_neighbors, each config is fitted on
+its own n_neighbors nearest), then scored for runtime, kNN preservation,
+trustworthiness and separation by group. Each layout is written in the
+umap_3d_data.json format, plus a summary table.
+
+Run from 3d-landscape/, after compute_3d_umap_filtered.py:
+    python scripts/sweep_umap.py --n-neighbors 5,15,30 --min-dist 0.0,0.1,0.5 --workers 4
+"""
+
+import argparse
+import itertools
+import json
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+from embedding_cache import default_cache_dir, encode_sentences
+from knn_graph import cached_knn, default_knn_cache_dir
+from layout_quality import layout_report
+from sentence_dedup import deduplicate
+from sentence_records import iter_records
+
+METRIC = "cosine"
+RANDOM_STATE = 42
+
+# Embeddings, kNN graph and groups of the current pool worker, set by _init_worker
+_worker_data = None
+
+
+def _init_worker(embeddings, knn, groups):
+    global _worker_data
+    _worker_data = (embeddings, knn, groups)
+
+
+def _run_config(config):
+    import umap
+
+    embeddings, knn, groups = _worker_data
+    indices, distances, search_index = knn
+    # Each config is fitted on its own n_neighbors nearest, not the shared larger graph
+    indices = indices[:, :config["n_neighbors"]]
+    distances = distances[:, :config["n_neighbors"]]
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")  # n_jobs overridden by random_state
+        reducer = umap.UMAP(
+            n_components=config["n_components"],
+            n_neighbors=config["n_neighbors"],
+            min_dist=config["min_dist"],
+            metric=METRIC,
+            random_state=RANDOM_STATE,
+            # UMAP edits the graph in place, every config gets its own copy
+            precomputed_knn=(indices.copy(), distances.copy(), search_index),
+        )
+        coords = reducer.fit_transform(embeddings)
+    runtime = time.perf_counter() - start
+
+    report = layout_report(embeddings, indices, coords, groups, k=config["n_neighbors"])
+    return coords, {**config, "runtime_s": runtime, **report}
+
+
+def parse_list(value, cast):
+    return [cast(item) for item in value.split(",") if item.strip()]
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n-neighbors", default="15", help="Comma-separated values (default: 15)")
+    parser.add_argument("--min-dist", default="0.1", help="Comma-separated values (default: 0.1)")
+    parser.add_argument("--n-components", default="3", help="Comma-separated values (default: 3)")
+    parser.add_argument("--workers", type=int, default=1, help="Configurations run at once (default: 1)")
+    parser.add_argument("--input", type=Path, default=None, help="Default: 3DUMAP/data/umap_3d_data.json")
+    parser.add_argument("--output-dir", type=Path, default=None, help="Default: 3DUMAP/data/sweep")
+    return parser.parse_args()
+
+
+def format_value(value):
+    if value is None:
+        return "-"
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def main():
+    args = parse_args()
+
+    script_dir = Path(__file__).parent
+    root_dir = script_dir.parent
+    data_dir = root_dir / "3DUMAP" / "data"
+    input_path = args.input or data_dir / "umap_3d_data.json"
+    output_dir = args.output_dir or data_dir / "sweep"
+
+    configs = [
+        {"n_neighbors": n_neighbors, "min_dist": min_dist, "n_components": n_components}
+        for n_neighbors, min_dist, n_components in itertools.product(
+            parse_list(args.n_neighbors, int),
+            parse_list(args.min_dist, float),
+            parse_list(args.n_components, int),
+        )
+    ]
+    print(f"Sweeping {len(configs)} UMAP configurations")
+
+    # ========================================================================
+    # STEP 1: Load points, embeddings and the shared kNN graph
+    # ========================================================================
+    print(f"Loading {input_path}...")
+    points = list(iter_records(input_path))
+
+    # Same dedup as the pipeline: each distinct sentence is laid out once
+    sentences = [point["sentence"] for point in points]
+    representatives, inverse = deduplicate(sentences)
+    embeddings = encode_sentences([sentences[i] for i in representatives], default_cache_dir(data_dir))
+    groups = [points[i].get("group") for i in representatives]
+    print(f"Embeddings shape: {embeddings.shape}")
+
+    max_neighbors = max(config["n_neighbors"] for config in configs)
+    knn = cached_knn(embeddings, max_neighbors, METRIC, default_knn_cache_dir(data_dir), RANDOM_STATE)
+
+    # ========================================================================
+    # STEP 2: Lay out every configuration
+    # ========================================================================
+    results = []
+    output_dir.mkdir(parents=True, exist_ok=True)
+    if args.workers > 1:
+        print(f"Running with {args.workers} worker processes...")
+        # Spawned, not forked: numba's threading layer in this process is not fork-safe
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(embeddings, knn, groups),
+        )
+        runs = executor.map(_run_config, configs)
+    else:
+        executor = None
+        _init_worker(embeddings, knn, groups)
+        runs = map(_run_config, configs)
+
+    # Results arrive in config order
+    for coords, result in runs:
+        name = "nn{n_neighbors}_md{min_dist}_{n_components}d".format(**result)
+        coords = coords[inverse]
+        # Same format as umap_3d_data.json: x/y from the layout, z stays the score axis
+        layout = [
+            {**point, "x": float(xy[0]), "y": float(xy[1])} for point, xy in zip(points, coords)
+        ]
+        layout_path = output_dir / f"umap_{name}.json"
+        with open(layout_path, "w", encoding="utf-8") as f:
+            json.dump(layout, f, indent=2, ensure_ascii=False)
+        results.append({"layout": layout_path.name, **result})
+        print(f"  {name}: {result['runtime_s']:.1f}s")
+    if executor is not None:
+        executor.shutdown()
+
+    # ========================================================================
+    # STEP 3: Summary
+    # ========================================================================
+    columns = [
+        "n_neighbors", "min_dist", "n_components", "runtime_s",
+        "knn_preservation", "trustworthiness", "group_separation",
+    ]
+    print("\n" + "  ".join(f"{column:>16s}" for column in columns))
+    for result in results:
+        print("  ".join(f"{format_value(result[column]):>16s}" for column in columns))
+
+    summary_path = output_dir / "summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved {len(results)} layouts and {summary_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Saved UMAP model for placing new sentences into an existing layout.
+
+After a full fit the UMAP reducer is pickled together with what is needed
+to decide later whether it can still be trusted:
+  - n_fitted:           sentences in the layout the model was fitted for
+  - n_appended:         sentences placed with transform() since then
+  - reference_distance: mean cosine distance of fitted sentences to their
+                        n_neighbors nearest fitted neighbors
+  - params:             embedding model and UMAP parameters of the fit
+  - pre_reducer:        the fitted PCA / random projection applied to the
+                        embeddings before UMAP, or None
+  - alignment:          the move from the reducer's output onto the exported
+                        x/y (after a warm-started fit), or None
+
+The reducer keeps its training data and nearest-neighbor search index, so
+transform() places new sentences without moving the fitted ones.
+check_drift() compares new sentences with the fitted set and says when a
+full refit is due instead.
+"""
+
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+
+# Bump when the saved layout changes, to ignore old model files
+MODEL_VERSION = 1
+
+DEFAULT_REFIT_FRACTION = 0.2
+DEFAULT_REFIT_DISTANCE_RATIO = 1.5
+
+
+def model_path_for(data_path):
+    """Where the UMAP model behind a umap_3d_data.json style file is saved"""
+    data_path = Path(data_path)
+    return data_path.with_name(f"{data_path.stem}_model.pickle")
+
+
+def mean_knn_distance(reference, queries, k, exclude_self=False, sample=2000, seed=42):
+    """
+    Mean cosine distance of query rows to their k nearest rows of reference.
+    With exclude_self the queries are rows of reference and skip themselves.
+    At most sample queries are used.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    queries = np.asarray(queries, dtype=np.float32)
+    if len(queries) > sample:
+        rows = np.random.default_rng(seed).choice(len(queries), sample, replace=False)
+        queries = queries[np.sort(rows)]
+
+    k = min(k, len(reference) - 1 if exclude_self else len(reference))
+    index = NearestNeighbors(n_neighbors=k + 1 if exclude_self else k, metric="cosine", algorithm="brute")
+    index.fit(reference)
+    distances, _ = index.kneighbors(queries)
+    if exclude_self:
+        distances = distances[:, 1:]  # The query itself, at distance 0
+    return float(distances.mean())
+
+
+def save_umap_model(path, reducer, embeddings, params, pre_reducer=None, n_fitted=None, alignment=None):
+    """
+    Pickle a fitted reducer with the statistics check_drift() needs.
+    embeddings are what the reducer was fitted on (after any pre_reducer);
+    n_fitted is the number of sentences in the layout when that is more,
+    e.g. for a fit on landmarks; alignment moves the reducer's output into
+    the exported frame (see layout_alignment).
+    """
+    state = {
+        "version": MODEL_VERSION,
+        "reducer": reducer,
+        "n_fitted": n_fitted or len(embeddings),
+        "n_appended": 0,
+        "reference_distance": mean_knn_distance(
+            embeddings, embeddings, reducer.n_neighbors, exclude_self=True
+        ),
+        "params": params,
+        "pre_reducer": pre_reducer,
+        "alignment": alignment,
+    }
+    write_umap_model(path, state)
+    return state
+
+
+def write_umap_model(path, state):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_umap_model(path, params):
+    """Saved model state, or None when missing, unreadable or fitted with other params"""
+    try:
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if state.get("version") != MODEL_VERSION or state.get("params") != params:
+        return None
+    return state
+
+
+def check_drift(state, new_embeddings, refit_fraction=DEFAULT_REFIT_FRACTION,
+                refit_distance_ratio=DEFAULT_REFIT_DISTANCE_RATIO):
+    """
+    Reason to refit instead of transforming new_embeddings, or None.
+    A refit is due when more than refit_fraction of the fitted set has been
+    appended since the last fit, or when the new sentences sit further from
+    their fitted neighbors than refit_distance_ratio times the fitted
+    sentences do (new, unlike content the layout has no room for).
+    """
+    appended = state["n_appended"] + len(new_embeddings)
+    fraction = appended / state["n_fitted"]
+    print(f"  Appended since last fit: {appended} ({100 * fraction:.1f}% of {state['n_fitted']})")
+    if fraction > refit_fraction:
+        return f"appended sentences exceed {100 * refit_fraction:.0f}% of the fitted set"
+
+    reducer = state["reducer"]
+    distance = mean_knn_distance(reducer._raw_data, new_embeddings, reducer.n_neighbors)
+    ratio = distance / state["reference_distance"] if state["reference_distance"] else np.inf
+    print(f"  Neighbor distance of new sentences: {distance:.3f} "
+          f"({ratio:.2f}x the fitted sentences)")
+    if ratio > refit_distance_ratio:
+        return f"new sentences are {ratio:.2f}x further from their neighbors than fitted ones"
+    return None
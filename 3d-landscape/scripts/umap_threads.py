@@ -0,0 +1,55 @@
+"""
+Multi-threaded UMAP fits, seeded as far as umap-learn allows.
+
+umap-learn only runs its parallel layout optimization when random_state is
+None: a fixed random_state forces n_jobs=1. The parallel path then draws
+its spectral initialization and its RNG streams from numpy's global RNG,
+so seeding that RNG for the duration of the fit fixes them:
+
+    with seeded_global_rng(42):
+        coords = umap.UMAP(**threaded_params(params, threads=8)).fit_transform(data)
+
+Threaded fits are still not reproducible. umap-learn already keeps one
+seeded RNG stream per sample, so per-partition seeds add nothing. What
+varies is that numba's prange threads update the shared embedding without
+locks (Hogwild-style SGD), and the result depends on how their writes
+interleave. umap-learn has no hook to change that short of reimplementing
+its optimizer. Repeated threaded runs differ by small amounts (see
+benchmark_umap_threads.py). Aligning the result onto a reference layout
+(layout_alignment) removes rotation, reflection and scale, so consecutive
+builds line up, but only the single-threaded path gives the same layout
+twice.
+"""
+
+from contextlib import contextmanager
+
+import numpy as np
+
+
+def threaded_params(params, threads):
+    """
+    UMAP keyword arguments for a fit on threads threads (-1 for all cores):
+    params without random_state, which the caller seeds with
+    seeded_global_rng() instead. threads == 1 returns params unchanged.
+    """
+    if threads == 1:
+        return dict(params)
+    if threads > 1:
+        import numba
+
+        # numba refuses more threads than it started with (NUMBA_NUM_THREADS, the core count)
+        threads = min(threads, numba.config.NUMBA_NUM_THREADS)
+    params = {key: value for key, value in params.items() if key != "random_state"}
+    return {**params, "n_jobs": threads}
+
+
+@contextmanager
+def seeded_global_rng(seed):
+    """Seed numpy's global RNG inside the block, restoring its state after"""
+    state = np.random.get_state()
+    if seed is not None:
+        np.random.seed(seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(state)
@@ -1,16 +1,22 @@
 import json
 from collections import Counter
 
+from keyword_counts import load_keyword_counts
+
 # Load the data
 with open('3DUMAP/data/umap_3d_data.json', 'r', encoding='utf-8') as f:
     data = json.load(f)
 
+# Sparse keyword count matrix and most frequent keyword of every sentence
+counts = load_keyword_counts('3DUMAP/data/umap_3d_data.json', data)
+most_frequent = counts.dominant_keywords()
+
 print("=" * 80)
 print("VERIFICATION: Filtering logic check")
 print("=" * 80)
 
 # Test 1: Verify all sentences have keywords
-sentences_with_keywords = sum(1 for d in data if d.get('keyword'))
+sentences_with_keywords = int((counts.totals() > 0).sum())
 print(f"\n✓ Test 1: Sentences with keywords")
 print(f"  Total sentences: {len(data)}")
 print(f"  Sentences with keywords: {sentences_with_keywords}")
@@ -18,14 +24,7 @@ print(f"  Percentage: {100 * sentences_with_keywords / len(data):.1f}%")
 
 # Test 2: Show distribution of most frequent keywords
 print(f"\n✓ Test 2: Distribution of most frequent keywords")
-most_freq_keywords = []
-for d in data:
-    if d.get('keyword') and isinstance(d['keyword'], list):
-        counter = Counter(d['keyword'])
-        most_freq = counter.most_common(1)[0][0]
-        most_freq_keywords.append(most_freq)
-
-kw_distribution = Counter(most_freq_keywords)
+kw_distribution = Counter(kw for kw in most_frequent if kw is not None)
 print(f"  Total unique main keywords: {len(kw_distribution)}")
 print(f"\n  Top 10 most frequent main keywords:")
 for kw, count in kw_distribution.most_common(10):
@@ -37,8 +36,7 @@ print(f"\n✓ Test 3: Sample filtering scenarios")
 test_keywords = ['critical', 'making', 'material']
 
 for test_kw in test_keywords:
-    filtered = [d for d in data if d.get('keyword') and isinstance(d['keyword'], list)]
-    filtered = [d for d in filtered if Counter(d['keyword']).most_common(1)[0][0].lower() == test_kw.lower()]
+    filtered = [d for d, kw in zip(data, most_frequent) if kw is not None and kw.lower() == test_kw.lower()]
     
     if filtered:
         print(f"\n  Filtering by '{test_kw}': {len(filtered)} sentences")
@@ -1,10 +1,16 @@
 import json
-from collections import Counter
+
+import numpy as np
+
+from keyword_counts import load_keyword_counts
 
 # Load the data
 with open('3DUMAP/data/umap_3d_data.json', 'r', encoding='utf-8') as f:
     data = json.load(f)
 
+# Sparse keyword count matrix, one row per sentence
+counts = load_keyword_counts('3DUMAP/data/umap_3d_data.json', data)
+
 print("=" * 80)
 print("VERIFICATION: Multiple click filtering")
 print("=" * 80)
@@ -20,26 +26,16 @@ test_cases = [
 ]
 
 for keyword, required_count in test_cases:
-    matching = 0
-    for d in data:
-        keyword_array = d.get('keyword', [])
-        count = sum(1 for kw in keyword_array if kw.lower() == keyword.lower())
-        if count == required_count:
-            matching += 1
+    matches = np.flatnonzero(counts.rows_with_count(keyword, required_count, ignore_case=True))
+    matching = len(matches)
     
     pct = 100 * matching / len(data)
     print(f"\n'{keyword}' appears exactly {required_count}x: {matching} sentences ({pct:.1f}%)")
     
     # Show examples
-    examples = 0
-    for d in data:
-        if examples >= 2:
-            break
-        keyword_array = d.get('keyword', [])
-        count = sum(1 for kw in keyword_array if kw.lower() == keyword.lower())
-        if count == required_count:
-            print(f"  Example: {keyword_array} → count={count}")
-            examples += 1
+    for idx in matches[:2]:
+        keyword_array = data[idx].get('keyword', [])
+        print(f"  Example: {keyword_array} → count={required_count}")
 
 print("\n" + "=" * 80)
 print("✓ Filtering by occurrence count will now work correctly!")
@@ -0,0 +1,62 @@
+"""
+Warm-started UMAP refits.
+
+A refit from UMAP's spectral initialization lays the landscape out anew:
+clusters end up in different places every time. Starting the optimization
+from the previous layout instead keeps the existing points where readers
+know them and needs far fewer epochs to converge:
+  - sentences in the previous layout start at their previous x/y
+  - new sentences start at the mean position of their nearest previously
+    placed sentences in embedding space
+  - components beyond x/y are not exported (z is the score axis), so they
+    start from the leading principal components of the embeddings
+The optimization runs with a lower learning rate than a cold fit, so the
+first epochs refine the layout instead of scattering it. UMAP rescales an
+initial layout to 0..10 per axis, so the result is mapped back onto the
+previous coordinates afterwards (see layout_alignment).
+"""
+
+import numpy as np
+
+DEFAULT_WARM_START_EPOCHS = 50
+
+# UMAP's default is 1.0, which moves points far from a converged start
+WARM_START_LEARNING_RATE = 0.1
+
+
+def umap_default_epochs(n_rows):
+    """Epochs UMAP runs when n_epochs is not given (as in umap-learn)"""
+    return 500 if n_rows <= 10000 else 200
+
+
+def warm_start_init(embeddings, previous_xy, n_components, n_neighbors=15, seed=42):
+    """
+    Initial UMAP embedding for the rows of embeddings, from previous_xy (x/y
+    per row, NaN for rows that were not in the previous layout). None when
+    no row was.
+    """
+    from sklearn.neighbors import NearestNeighbors
+
+    known = ~np.isnan(previous_xy).any(axis=1)
+    if not known.any():
+        return None
+
+    init = np.zeros((len(embeddings), n_components), dtype=np.float32)
+    init[known, :2] = previous_xy[known]
+    unknown = ~known
+    if unknown.any():
+        index = NearestNeighbors(n_neighbors=min(n_neighbors, int(known.sum())), metric="cosine")
+        index.fit(embeddings[known])
+        _, neighbors = index.kneighbors(embeddings[unknown])
+        init[unknown, :2] = init[known, :2][neighbors].mean(axis=1)
+
+    if n_components > 2:
+        from sklearn.decomposition import PCA
+
+        pca = PCA(n_components=n_components - 2, svd_solver="randomized", random_state=seed)
+        components = pca.fit_transform(embeddings)
+        # Same spread as x/y, so no axis dominates the first distances
+        scale = float(init[known, :2].std()) / max(float(components.std()), 1e-12)
+        init[:, 2:] = components * scale
+    return init
+
@@ -1,20 +1,16 @@
 import json
+import sys
+from pathlib import Path
+
+# Shared keyword vocabulary lives with the 3D pipeline scripts
+sys.path.insert(0, str(Path(__file__).resolve().parent / '3d-landscape' / 'scripts'))
+from keyword_vocabulary import load_vocabulary
 
 # Load keywords_precomputed to extract lemmatization groups
-with open('2d-landscape/data/keywords_precomputed.json', 'r', encoding='utf-8') as f:
-    keywords_data = json.load(f)
+vocabulary = load_vocabulary('2d-landscape/data/keywords_precomputed.json')
 
-# Build lemmatization map from keywords_precomputed
 # Map each variant to its BASE keyword (the key in the dict)
-lemmatization_map = {}
-
-for section_name in ['embedded_keywords', 'speculative_keywords', 'critique_keywords']:
-    if section_name in keywords_data:
-        for base_keyword, variants in keywords_data[section_name].items():
-            # Map each variant to the base keyword
-            if isinstance(variants, list):
-                for variant in variants:
-                    lemmatization_map[variant.lower()] = base_keyword
+lemmatization_map = vocabulary.variant_to_main
 
 print(f"✓ Loaded {len(lemmatization_map)} lemmatization mappings")
 